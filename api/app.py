@@ -1,22 +1,41 @@
 """FastAPI 应用"""
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
-from qwen_client.manager import BrowserManager
-from .routes import router, set_manager
+from qwen_client.config import DEBUG
+from qwen_client.manager import BrowserPool
+from .cache import SemanticCache
+from .embedder import OnnxEmbedder
+from .logging_setup import setup_logging, teardown_logging
+from .routes import router, set_cache, set_manager
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 启动：初始化浏览器
-    mgr = BrowserManager()
-    await mgr.startup()
-    set_manager(mgr)
+    # 启动：日志 + 预热浏览器池（大小由 POOL_SIZE 控制）+ 响应缓存
+    setup_logging(logging.DEBUG if DEBUG else logging.INFO)
+    pool = BrowserPool()
+    await pool.startup()
+    set_manager(pool)
+    embedder = OnnxEmbedder()
+    embedder.start()
+    app.state.embedder = embedder
+    cache = SemanticCache(embedder=embedder)
+    set_cache(cache)
     yield
-    # 关闭：释放浏览器
-    await mgr.shutdown()
+    # 关闭：释放所有浏览器
+    cache.close()
+    await embedder.stop()
+    await pool.shutdown()
+    teardown_logging()
 
 
-app = FastAPI(title="Qwen Web Client API", lifespan=lifespan)
+app = FastAPI(
+    title="Qwen Web Client API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 app.include_router(router)
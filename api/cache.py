@@ -0,0 +1,182 @@
+"""/v1/chat 语义响应缓存
+
+浏览器驱动的 LLM 往返要数秒，重复/近似重复的 prompt 没必要每次都付这个成本：
+
+- 精确命中：prompt SHA-256 直查（~毫秒级），连 embedding 都不用算
+- 语义命中：prompt embedding 余弦相似度超过阈值即返回缓存回复
+- 带图片的请求不缓存（仅凭文本无法判断多模态语义是否一致）
+
+embedding 依赖 sentence-transformers（可选），未安装时自动退化为仅精确缓存。
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from qwen_client.config import CACHE_CONFIG
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+logger = logging.getLogger("api.cache")
+
+
+class SemanticCache:
+    """prompt → response 缓存，精确哈希 + 语义相似度两级查找"""
+
+    def __init__(self, db_path: str = None, embedder=None):
+        self.enabled = CACHE_CONFIG["enabled"]
+        self.threshold = CACHE_CONFIG["threshold"]
+        self.ttl = CACHE_CONFIG["ttl"]
+        db_path = db_path or CACHE_CONFIG["db_path"]
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # sqlite 操作全部经 asyncio.to_thread 跑在 worker 线程（见 get/put），
+        # 连接被多个线程轮流使用，关掉同线程检查并用锁串行化
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "  hash TEXT PRIMARY KEY,"
+            "  prompt TEXT NOT NULL,"
+            "  response TEXT NOT NULL,"
+            "  embedding BLOB,"
+            "  created_at REAL NOT NULL"
+            ")"
+        )
+        self._db.commit()
+
+        # embedding 后端：优先共享 ONNX 会话（见 embedder.py），
+        # 其次 sentence-transformers，都不可用则仅精确缓存
+        self._embedder = embedder if embedder is not None and embedder.available else None
+        self._model = None
+        if self.enabled and self._embedder is None and SentenceTransformer is not None:
+            try:
+                self._model = SentenceTransformer(CACHE_CONFIG["embed_model"])
+            except Exception as e:
+                logger.warning("embedding 模型加载失败，退化为精确缓存: %s", e)
+
+    @staticmethod
+    def _hash(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    async def _embed(self, prompt: str) -> Optional[list]:
+        if self._embedder is not None:
+            return await self._embedder.embed(prompt)
+        if self._model is not None:
+            # sentence-transformers 是同步 CPU 计算，丢线程池避免卡事件循环
+            encoded = await asyncio.to_thread(self._model.encode, prompt)
+            return encoded.tolist()
+        return None
+
+    @staticmethod
+    def _pack(emb: list) -> bytes:
+        """float16 序列化，索引字节减半"""
+        return struct.pack(f"{len(emb)}e", *emb)
+
+    @staticmethod
+    def _unpack(blob: bytes) -> list:
+        return list(struct.unpack(f"{len(blob) // 2}e", blob))
+
+    @staticmethod
+    def _cos_sim(a: list, b: list) -> float:
+        dot = sum(x * y for x, y in zip(a, b))
+        na = sum(x * x for x in a) ** 0.5
+        nb = sum(x * x for x in b) ** 0.5
+        if na == 0 or nb == 0:
+            return 0.0
+        return dot / (na * nb)
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _get_exact_sync(self, h: str) -> Optional[str]:
+        """精确哈希查找；命中但已过期时顺手删掉该行"""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM cache WHERE hash = ?", (h,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1]):
+                self._db.execute("DELETE FROM cache WHERE hash = ?", (h,))
+                self._db.commit()
+                return None
+            return row[0]
+
+    def _scan_sync(self, emb: list) -> Optional[str]:
+        """全表余弦扫描取最相似，扫描中发现的过期行批量删除"""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT hash, response, embedding, created_at FROM cache "
+                "WHERE embedding IS NOT NULL"
+            ).fetchall()
+        best, best_sim = None, 0.0
+        expired = []
+        for h, response, emb_blob, created_at in rows:
+            if self._expired(created_at):
+                expired.append((h,))
+                continue
+            sim = self._cos_sim(emb, self._unpack(emb_blob))
+            if sim > best_sim:
+                best, best_sim = response, sim
+        if expired:
+            with self._db_lock:
+                self._db.executemany("DELETE FROM cache WHERE hash = ?", expired)
+                self._db.commit()
+        if best is not None and best_sim > self.threshold:
+            return best
+        return None
+
+    def _put_sync(self, h: str, prompt: str, response: str,
+                  emb_blob: Optional[bytes]) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache "
+                "(hash, prompt, response, embedding, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (h, prompt, response, emb_blob, time.time()),
+            )
+            self._db.commit()
+
+    async def get(self, prompt: str) -> Optional[str]:
+        """查缓存：先精确哈希，miss 再做语义相似度扫描
+
+        sqlite 查询和逐行余弦计算都是同步 CPU/IO，条目多时有几百毫秒
+        量级，统一丢 asyncio.to_thread 执行，不占事件循环。
+        """
+        if not self.enabled:
+            return None
+
+        # 1. 精确命中（跳过 embedding 计算）
+        hit = await asyncio.to_thread(self._get_exact_sync, self._hash(prompt))
+        if hit is not None:
+            return hit
+
+        # 2. 语义命中
+        emb = await self._embed(prompt)
+        if emb is None:
+            return None
+        return await asyncio.to_thread(self._scan_sync, emb)
+
+    async def put(self, prompt: str, response: str) -> None:
+        """写入缓存（embedding 不可用时只存哈希）"""
+        if not self.enabled:
+            return
+        emb = await self._embed(prompt)
+        await asyncio.to_thread(
+            self._put_sync,
+            self._hash(prompt),
+            prompt,
+            response,
+            self._pack(emb) if emb is not None else None,
+        )
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,119 @@
+"""进程级共享的 ONNX embedding 后端
+
+每个请求临时加载 sentence-transformer 要 ~200ms + 数百 MB 内存。
+这里改成：
+
+- 整个进程只建一个 onnxruntime InferenceSession（int8 量化模型，
+  CPU 上吞吐约为 FP32 的 2 倍）
+- 微批聚合：协程把文本丢进 asyncio.Queue，后台任务每隔几毫秒取一批
+  （上限 32 条）跑一次批量推理，再把结果分发给各自的 Future
+
+依赖 onnxruntime + tokenizers（可选），模型路径由 CACHE_ONNX_MODEL /
+CACHE_ONNX_TOKENIZER 指定；任一缺失时 available 为 False。
+"""
+import asyncio
+import logging
+
+from qwen_client.config import CACHE_CONFIG
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+except ImportError:
+    np = ort = Tokenizer = None
+
+logger = logging.getLogger("api.embedder")
+
+
+class OnnxEmbedder:
+    """单 InferenceSession + 微批聚合的 embedding 服务"""
+
+    def __init__(self):
+        self._session = None
+        self._tokenizer = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: asyncio.Task = None
+        self._batch_window = CACHE_CONFIG["embed_batch_window"]
+        self._batch_size = CACHE_CONFIG["embed_batch_size"]
+
+        model_path = CACHE_CONFIG["onnx_model"]
+        tokenizer_path = CACHE_CONFIG["onnx_tokenizer"]
+        if ort is None or not model_path or not tokenizer_path:
+            return
+        try:
+            self._session = ort.InferenceSession(
+                model_path, providers=["CPUExecutionProvider"]
+            )
+            self._tokenizer = Tokenizer.from_file(tokenizer_path)
+        except Exception as e:
+            logger.warning("ONNX embedding 模型加载失败: %s", e)
+            self._session = None
+            self._tokenizer = None
+
+    @property
+    def available(self) -> bool:
+        return self._session is not None
+
+    def start(self) -> None:
+        """启动后台攒批任务（需在事件循环内调用）"""
+        if self.available and self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._drain_loop())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def embed(self, text: str) -> list:
+        """入队等待批量推理结果"""
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, fut))
+        return await fut
+
+    async def _drain_loop(self) -> None:
+        """后台任务：攒一小批后跑一次批量推理，分发结果"""
+        while True:
+            text, fut = await self._queue.get()
+            batch = [(text, fut)]
+            # 攒批窗口内尽量多收，摊薄单次推理的固定开销
+            await asyncio.sleep(self._batch_window)
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                embeddings = await asyncio.to_thread(
+                    self._encode_batch, [t for t, _ in batch]
+                )
+                for (_, f), emb in zip(batch, embeddings):
+                    if not f.done():
+                        f.set_result(emb)
+            except Exception as e:
+                for _, f in batch:
+                    if not f.done():
+                        f.set_exception(e)
+
+    def _encode_batch(self, texts: list) -> list:
+        """一次批量推理：tokenize → session.run → mean pooling → L2 归一化"""
+        encodings = self._tokenizer.encode_batch(texts)
+        max_len = max(len(e.ids) for e in encodings)
+        input_ids = np.zeros((len(texts), max_len), dtype=np.int64)
+        attention_mask = np.zeros((len(texts), max_len), dtype=np.int64)
+        for i, e in enumerate(encodings):
+            input_ids[i, : len(e.ids)] = e.ids
+            attention_mask[i, : len(e.ids)] = e.attention_mask
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if any(i.name == "token_type_ids" for i in self._session.get_inputs()):
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self._session.run(None, feeds)[0]  # (batch, seq, dim)
+        mask = attention_mask[:, :, None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        pooled = pooled / np.clip(norms, 1e-9, None)
+        return [row.tolist() for row in pooled]
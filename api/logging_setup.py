@@ -0,0 +1,75 @@
+"""非阻塞结构化日志配置
+
+print / 同步 StreamHandler 会在事件循环线程里做阻塞的 stdout 写入，
+高并发时会卡住其他协程。这里把日志先丢进内存队列（QueueHandler），
+由后台 QueueListener 线程负责真正的 I/O，事件循环只付入队的成本。
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+try:
+    import orjson
+
+    def _dumps(obj: dict) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    def _dumps(obj: dict) -> str:
+        return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+# LogRecord 自带的属性，format 时跳过，只把 extra={...} 里的字段带进 JSON
+_RESERVED = {
+    "name", "msg", "args", "levelname", "levelno", "pathname", "filename",
+    "module", "exc_info", "exc_text", "stack_info", "lineno", "funcName",
+    "created", "msecs", "relativeCreated", "thread", "threadName",
+    "processName", "process", "taskName", "message", "asctime",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """结构化 JSON 格式，额外字段通过 logger.info(..., extra={...}) 传入"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return _dumps(data)
+
+
+_listener: logging.handlers.QueueListener = None
+
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """配置根 logger：QueueHandler 入队 → 后台线程写 stdout"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(-1)
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, stream)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+
+def teardown_logging() -> None:
+    """停止后台日志线程，冲刷剩余日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
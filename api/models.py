@@ -1,25 +1,43 @@
-"""请求/响应数据模型"""
-from typing import Optional
+"""请求/响应数据模型
 
-from pydantic import BaseModel
+模型每个请求都会实例化，统一用精简的 model_config 降低验证/分配开销：
+- extra='ignore'：多余字段直接丢弃，不构建错误信息
+- validate_default=False：默认值不重复验证
+响应模型在路由里用 model_construct() 构建，完全跳过输出验证。
+"""
+from pydantic import BaseModel, ConfigDict
+
+_LEAN_CONFIG = ConfigDict(
+    extra="ignore",
+    str_strip_whitespace=False,
+    validate_default=False,
+)
 
 
 class ChatRequest(BaseModel):
+    model_config = _LEAN_CONFIG
+
     prompt: str
-    image_path: Optional[str] = None
+    image_path: str | None = None
 
 
 class ChatResponse(BaseModel):
+    model_config = _LEAN_CONFIG
+
     response: str
     request_count: int
 
 
 class HealthResponse(BaseModel):
+    model_config = _LEAN_CONFIG
+
     status: str
     browser_ready: bool
     request_count: int
 
 
 class RestartResponse(BaseModel):
+    model_config = _LEAN_CONFIG
+
     status: str
     message: str
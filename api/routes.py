@@ -1,52 +1,199 @@
 """API 路由"""
+import asyncio
+import hashlib
+import logging
 import time
-from typing import Optional
 
-from fastapi import APIRouter, HTTPException
+import anyio.to_thread
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 
-from qwen_client.manager import BrowserManager
+from qwen_client.config import API_CONFIG
+from qwen_client.manager import BrowserPool
+from .cache import SemanticCache
 from .models import ChatRequest, ChatResponse, HealthResponse, RestartResponse
 
-router = APIRouter(prefix="/v1")
+logger = logging.getLogger("api.routes")
 
-# 全局 BrowserManager 实例，由 app.py lifespan 注入
-manager: Optional[BrowserManager] = None
+router = APIRouter(prefix="/v1", default_response_class=ORJSONResponse)
 
+# 全局 BrowserPool / 缓存实例，由 app.py lifespan 注入
+pool: BrowserPool | None = None
+cache: SemanticCache | None = None
 
-def set_manager(m: BrowserManager) -> None:
-    global manager
-    manager = m
+# single-flight：并发的相同 prompt 只驱动一次浏览器，后到的请求等首个的结果
+_inflight: dict[str, asyncio.Future] = {}
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
-    if not manager or not manager.is_ready:
+def _flight_key(prompt: str, image_path: str | None) -> str:
+    raw = prompt + "\x00" + (image_path or "")
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def set_manager(p: BrowserPool) -> None:
+    global pool
+    pool = p
+
+
+def set_cache(c: SemanticCache) -> None:
+    global cache
+    cache = c
+
+
+# 超过该大小的请求体丢线程池解析，避免大 prompt 的 JSON 解码卡住事件循环
+_BODY_OFFLOAD_BYTES = 16_384
+
+
+async def _parse_chat_request(request: Request) -> ChatRequest:
+    """手动解析请求体，绕开 Pydantic 全量校验
+
+    prompt 可能是多 KB 的长文本，FastAPI 默认在事件循环线程里做
+    Pydantic 解析；这里改为 orjson 直解（大包丢 worker 线程），
+    再用 model_construct 跳过逐字段校验，只保留必要的类型检查。
+    """
+    raw = await request.body()
+    try:
+        if len(raw) > _BODY_OFFLOAD_BYTES:
+            data = await anyio.to_thread.run_sync(orjson.loads, raw)
+        else:
+            data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="请求体不是合法 JSON")
+
+    prompt = data.get("prompt") if isinstance(data, dict) else None
+    if not isinstance(prompt, str) or not prompt:
+        raise HTTPException(status_code=422, detail="prompt 必须是非空字符串")
+    image_path = data.get("image_path")
+    if image_path is not None and not isinstance(image_path, str):
+        raise HTTPException(status_code=422, detail="image_path 必须是字符串")
+    return ChatRequest.model_construct(prompt=prompt, image_path=image_path)
+
+
+@router.post("/chat", responses={200: {"model": ChatResponse}})
+async def chat(request: Request):
+    req = await _parse_chat_request(request)
+    if not pool or not pool.is_ready:
         raise HTTPException(status_code=503, detail="浏览器未就绪")
-    t_start = time.time()
+    t_start = time.perf_counter()
+
+    # 缓存前置：命中直接返回，不占用浏览器（带图片的请求不走缓存）
+    cacheable = cache is not None and req.image_path is None
+    if cacheable:
+        # 缓存是纯优化层：查询失败（sqlite/embedding 异常）按 miss
+        # 处理继续走浏览器，与下方 cache.put 的降级策略一致
+        try:
+            cached = await cache.get(req.prompt)
+        except Exception as e:
+            logger.warning("/v1/chat 缓存查询失败，按 miss 继续: %s", e)
+            cached = None
+        if cached is not None:
+            logger.info(
+                "/v1/chat 缓存命中",
+                extra={"prompt_len": len(req.prompt),
+                       "elapsed_ms": round((time.perf_counter() - t_start) * 1000, 1)},
+            )
+            return ORJSONResponse(
+                {"response": cached, "request_count": pool.request_count}
+            )
+
+    # single-flight：已有同样的请求在途，直接等它的结果
+    key = _flight_key(req.prompt, req.image_path)
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        try:
+            # shield：等待者被取消时不能连带 cancel 共享的 future
+            response = await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if inflight.cancelled():
+                # leader 断连被取消，等待者拿不到结果了
+                raise HTTPException(status_code=503, detail="在途请求被中断")
+            raise  # 等待者自身被取消，照常向上传播
+        except asyncio.TimeoutError:
+            # 与 leader 的超时路径保持同样的状态码
+            raise HTTPException(status_code=504, detail="浏览器响应超时")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        logger.info(
+            "/v1/chat 合并在途请求",
+            extra={"prompt_len": len(req.prompt),
+                   "elapsed_ms": round((time.perf_counter() - t_start) * 1000, 1)},
+        )
+        return ORJSONResponse(
+            {"response": response, "request_count": pool.request_count}
+        )
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
     try:
-        response = await manager.chat(req.prompt, req.image_path)
-        print(f"  [TIMING] /v1/chat 端到端总耗时: {time.time() - t_start:.1f}s")
-        return ChatResponse(response=response, request_count=manager.request_count)
+        async with pool.acquire() as mgr:
+            try:
+                # 上游超时：页面卡死时及时释放浏览器，限住尾延迟
+                response = await asyncio.wait_for(
+                    mgr.chat(req.prompt, req.image_path),
+                    timeout=API_CONFIG["chat_timeout"],
+                )
+            except asyncio.TimeoutError:
+                # 页面可能仍在生成被取消请求的回复，标记污染，
+                # 池归还路径会先 new_chat/重启再入池，避免响应串话
+                mgr.mark_tainted()
+                raise
+        fut.set_result(response)
+    except asyncio.TimeoutError as e:
+        fut.set_exception(e)
+        fut.exception()
+        logger.error(
+            "/v1/chat 上游超时",
+            extra={"elapsed_ms": round((time.perf_counter() - t_start) * 1000, 1)},
+        )
+        raise HTTPException(status_code=504, detail="浏览器响应超时")
     except Exception as e:
-        print(f"  [TIMING] /v1/chat 异常, 耗时: {time.time() - t_start:.1f}s")
+        fut.set_exception(e)
+        fut.exception()  # 没有等待者时避免 "exception never retrieved" 告警
+        logger.error(
+            "/v1/chat 异常: %s", e,
+            extra={"elapsed_ms": round((time.perf_counter() - t_start) * 1000, 1)},
+        )
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # leader 被取消（客户端断连）时不会走任何 except 分支，
+        # future 还悬着——cancel 掉，否则 join 上来的等待者永久挂起
+        if not fut.done():
+            fut.cancel()
+        del _inflight[key]
 
+    if cacheable:
+        # 缓存写入失败不影响已成功的对话结果，只告警
+        try:
+            await cache.put(req.prompt, response)
+        except Exception as e:
+            logger.warning("/v1/chat 缓存写入失败: %s", e)
+    logger.info(
+        "/v1/chat 完成",
+        extra={"prompt_len": len(req.prompt),
+               "elapsed_ms": round((time.perf_counter() - t_start) * 1000, 1)},
+    )
+    return ORJSONResponse(
+        {"response": response, "request_count": pool.request_count}
+    )
 
-@router.get("/health", response_model=HealthResponse)
+
+@router.get("/health", responses={200: {"model": HealthResponse}})
 async def health():
-    return HealthResponse(
-        status="ok" if manager and manager.is_ready else "unavailable",
-        browser_ready=manager.is_ready if manager else False,
-        request_count=manager.request_count if manager else 0,
-    )
+    # O(1)：直接序列化池维护的快照，不逐个聚合浏览器状态
+    if not pool:
+        return ORJSONResponse({
+            "status": "unavailable", "browser_ready": False, "request_count": 0,
+        })
+    return ORJSONResponse(pool.health)
 
 
-@router.post("/restart", response_model=RestartResponse)
+@router.post("/restart", responses={200: {"model": RestartResponse}})
 async def restart():
-    if not manager:
-        raise HTTPException(status_code=503, detail="BrowserManager 未初始化")
+    if not pool:
+        raise HTTPException(status_code=503, detail="BrowserPool 未初始化")
     try:
-        await manager.restart()
-        return RestartResponse(status="ok", message="浏览器已重启")
+        await pool.restart()
+        return ORJSONResponse({"status": "ok", "message": "浏览器池已重启"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
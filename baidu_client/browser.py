@@ -1,6 +1,8 @@
 """浏览器核心模块"""
 import asyncio
 import time
+from urllib.parse import urlsplit
+
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 
 from .config import (
@@ -12,9 +14,20 @@ from .config import (
     BROWSER_CONFIG,
     DEBUG,
 )
+from ._stealth import INIT_JS, PROBE_CALL_JS
 from .utils import find_element, save_cookies, load_cookies
 
 
+def _is_baidu_host(url: str) -> bool:
+    """URL 的 hostname 是否为第一方 baidu.com 域（含子域）
+
+    按 hostname 精确判断而非全串子串匹配：查询串/路径里带 "baidu"
+    的第三方资源（如 tracker.com/img?ref=baidu）不应被豁免。
+    """
+    host = urlsplit(url).hostname or ""
+    return host == "baidu.com" or host.endswith(".baidu.com")
+
+
 class BaiduBrowser:
     """百度文心助手浏览器管理器"""
 
@@ -30,7 +43,7 @@ class BaiduBrowser:
         if headless is None:
             headless = BROWSER_CONFIG["headless"]
 
-        t_start = time.time()
+        t_start = time.perf_counter()
         print(f"→ 启动浏览器 (headless={headless})...")
 
         self.playwright = await async_playwright().start()
@@ -40,56 +53,50 @@ class BaiduBrowser:
             args=BROWSER_CONFIG["args"],
         )
 
-        # 创建上下文，设置反检测参数
+        # 创建上下文，设置反检测参数。
+        # 状态文件存在时直接在建 context 时挂载，省掉之后 close/重建 context
+        # 的数百毫秒开销
         self.context = await self.browser.new_context(
             user_agent=BROWSER_CONFIG["user_agent"],
             viewport={"width": 1280, "height": 800},
             locale="zh-CN",
             timezone_id="Asia/Shanghai",
+            storage_state=str(STATE_FILE) if STATE_FILE.exists() else None,
         )
 
-        # 注入反检测脚本
-        await self.context.add_init_script("""
-            // 隐藏 webdriver 属性
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-
-            // 模拟真实的 plugins
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-
-            // 模拟真实的 languages
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['zh-CN', 'zh', 'en']
-            });
-        """)
+        # 拦截非必要资源，减少页面加载字节、加快 domcontentloaded。
+        # 豁免第一方 baidu.com 域（按 hostname 判断，见 _is_baidu_host）：
+        # 登录二维码、上传后的图片预览都是第一方图片，拦掉会直接破坏
+        # 登录/上传流程；要拦的是第三方统计、广告类资源。
+        # 挂在 context 上（而非 page），一个 handler 覆盖所有页面。
+        blocked = set(BROWSER_CONFIG["blocked_resources"])
+        if blocked:
+            async def _block_resources(route):
+                req = route.request
+                if req.resource_type in blocked and not _is_baidu_host(req.url):
+                    await route.abort()
+                else:
+                    await route.continue_()
+
+            await self.context.route("**/*", _block_resources)
+
+        # 注入反检测补丁 + window.__probe 探测助手（见 _stealth.py）：
+        # 探测函数随 context 初始化注入一次，之后每轮探测只发一个函数调用
+        await self.context.add_init_script(INIT_JS)
 
         self.page = await self.context.new_page()
         if DEBUG:
-            print(f"  [TIMING] 浏览器启动: {time.time() - t_start:.1f}s")
+            print(f"  [TIMING] 浏览器启动: {time.perf_counter() - t_start:.1f}s")
         print("✓ 浏览器已启动")
 
     async def load_cookies_and_goto(self) -> bool:
         """加载状态并跳转到百度文心页面"""
-        t_start = time.time()
+        t_start = time.perf_counter()
 
         # 使用 storage_state（包含 cookies + localStorage）
+        # 状态已在 launch() 建 context 时挂载，这里只需导航 + 校验
         if STATE_FILE.exists():
             print(f"✓ 已找到状态文件: {STATE_FILE}")
-            # 需要重新创建 context 来加载 storage_state
-            await self.page.close()
-            await self.context.close()
-
-            self.context = await self.browser.new_context(
-                user_agent=BROWSER_CONFIG["user_agent"],
-                viewport={"width": 1280, "height": 800},
-                locale="zh-CN",
-                timezone_id="Asia/Shanghai",
-                storage_state=str(STATE_FILE),
-            )
-            self.page = await self.context.new_page()
 
             # 调试：打印加载的 cookies
             if DEBUG:
@@ -98,19 +105,19 @@ class BaiduBrowser:
                 for c in loaded_cookies[:5]:
                     print(f"    - {c.get('name')}: domain={c.get('domain')}")
 
-            t_nav = time.time()
+            t_nav = time.perf_counter()
             print("→ 正在加载页面...")
             await self.page.goto(BAIDU_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"])
 
             if DEBUG:
-                print(f"  [TIMING] 页面导航(domcontentloaded): {time.time() - t_nav:.1f}s")
+                print(f"  [TIMING] 页面导航(domcontentloaded): {time.perf_counter() - t_nav:.1f}s")
 
-            t_login_check = time.time()
+            t_login_check = time.perf_counter()
             if await self._check_logged_in():
                 self._is_logged_in = True
                 if DEBUG:
-                    print(f"  [TIMING] 登录检查: {time.time() - t_login_check:.1f}s")
-                    print(f"  [TIMING] load_cookies_and_goto 总耗时: {time.time() - t_start:.1f}s")
+                    print(f"  [TIMING] 登录检查: {time.perf_counter() - t_login_check:.1f}s")
+                    print(f"  [TIMING] load_cookies_and_goto 总耗时: {time.perf_counter() - t_start:.1f}s")
                 print("✓ 登录状态有效")
                 return True
             else:
@@ -124,40 +131,35 @@ class BaiduBrowser:
     async def _check_logged_in(self) -> bool:
         """检查是否已登录
 
-        策略：先等输入框出现（确认页面渲染完成，不论是否登录都有），
-        再用即时 query_selector 检查"登录"按钮。
-        避免对不存在的元素做 wait_for_selector 长时间等待。
+        正向/负向指标合并为一次 page.evaluate 在浏览器内批量探测
+        （含可见性判断），每轮只付 1 次 CDP 往返。
+        页面可能还在渲染，短轮询等待正向指标（输入框）出现。
         """
+        pos = SELECTORS["logged_in_indicator"]
+        neg = SELECTORS["not_logged_in_indicator"]
         try:
             if DEBUG:
                 print("→ 检查登录状态...")
 
             # 1. 等待页面渲染完成（输入框出现，不论登录与否都有）
-            page_ready = False
-            for sel in SELECTORS["logged_in_indicator"]:
-                try:
-                    el = await self.page.wait_for_selector(sel, timeout=1000)
-                    if el:
-                        page_ready = True
-                        break
-                except Exception:
-                    continue
-
-            if not page_ready:
+            results = []
+            for _ in range(10):
+                results = await self.page.evaluate(PROBE_CALL_JS, pos + neg)
+                if any(results[:len(pos)]):
+                    break
+                await asyncio.sleep(0.1)
+
+            if not any(results[:len(pos)]):
                 if DEBUG:
                     print("  ✗ 页面未渲染完成")
                 return False
 
-            # 2. 页面已渲染，即时检查"登录"按钮（不等待）
-            for sel in SELECTORS["not_logged_in_indicator"]:
-                try:
-                    el = await self.page.query_selector(sel)
-                    if el and await el.is_visible():
-                        if DEBUG:
-                            print(f"  ✗ 检测到未登录标识: {sel}")
-                        return False
-                except Exception:
-                    continue
+            # 2. 页面已渲染，检查"登录"按钮（结果已在同一次探测里）
+            if any(results[len(pos):]):
+                if DEBUG:
+                    hit = neg[results[len(pos):].index(True)]
+                    print(f"  ✗ 检测到未登录标识: {hit}")
+                return False
 
             if DEBUG:
                 print("  ✓ 页面已加载且无登录按钮")
@@ -178,40 +180,46 @@ class BaiduBrowser:
             print("→ 等待用户完成登录...")
 
             # 核心逻辑：等待"登录"按钮消失（说明用户已登录）
-            start_time = time.time()
+            start_time = time.perf_counter()
             timeout_seconds = TIMEOUT["login_wait"] / 1000
 
-            while (time.time() - start_time) < timeout_seconds:
-                # 检查"登录"按钮是否还存在
-                not_logged_in, _ = await find_element(
-                    self.page,
-                    SELECTORS["not_logged_in_indicator"],
-                    timeout=2000,
-                    debug=False
-                )
+            while (time.perf_counter() - start_time) < timeout_seconds:
+                # 检查"登录"按钮是否还存在（批量探测，1 次往返）。
+                # 登录期间页面随时可能跳转/刷新（OAuth 回跳、站点自行
+                # reload），在途 evaluate 会抛 "Execution context was
+                # destroyed" 之类异常——视为"尚未登录"继续下一轮探测，
+                # 不能让一次正常导航中止整个登录流程
+                try:
+                    results = await self.page.evaluate(
+                        PROBE_CALL_JS, SELECTORS["not_logged_in_indicator"]
+                    )
+                except Exception as e:
+                    if DEBUG:
+                        print(f"  [DEBUG] 登录探测异常（页面可能在跳转）: {e}")
+                    await asyncio.sleep(1)
+                    continue
 
-                if not not_logged_in:
+                if not any(results):
                     # "登录"按钮消失了，说明已登录
                     print("✓ 检测到登录成功（登录按钮已消失）")
                     self._is_logged_in = True
 
-                    # 等待一段时间确保登录状态完全生效
-                    print("→ 等待登录状态稳定...")
-                    await asyncio.sleep(3)
-
-                    # 刷新页面确保状态完整
-                    await self.page.reload()
-                    await self.page.wait_for_load_state("networkidle", timeout=30000)
-                    await asyncio.sleep(2)
-
-                    # 再次确认登录状态
-                    not_logged_in_check, _ = await find_element(
-                        self.page,
-                        SELECTORS["not_logged_in_indicator"],
-                        timeout=3000,
-                        debug=False
+                    # 刷新页面确保状态完整。不等 networkidle（SPA 长连接会白等
+                    # 到超时）也不固定 sleep，直接等关键 UI 元素出现
+                    await self.page.reload(
+                        wait_until="domcontentloaded", timeout=TIMEOUT["navigation"]
                     )
-                    if not_logged_in_check:
+                    try:
+                        await self.page.wait_for_function(
+                            "sel => !!document.querySelector(sel)",
+                            arg=SELECTORS["logged_in_indicator"][0],
+                            timeout=15000,
+                        )
+                    except Exception:
+                        pass
+
+                    # 再次确认登录状态（合并探测，单次往返）
+                    if not await self._check_logged_in():
                         print("  [WARN] 刷新后登录状态丢失，继续等待...")
                         continue
 
@@ -253,9 +261,9 @@ class BaiduBrowser:
         return self._is_logged_in
 
     async def close(self) -> None:
-        """关闭浏览器"""
+        """关闭浏览器（失败也继续 stop playwright，不让半截资源泄漏）"""
         if self.browser:
-            await self.browser.close()
+            await asyncio.gather(self.browser.close(), return_exceptions=True)
         if self.playwright:
             await self.playwright.stop()
         print("✓ 浏览器已关闭")
@@ -1,11 +1,213 @@
 """聊天逻辑模块"""
 import asyncio
+import random
+import re
 import time
+import weakref
 from pathlib import Path
+from typing import Optional
 from playwright.async_api import Page
 
-from .config import SELECTORS, TIMEOUT, BAIDU_URL, DEBUG
-from .utils import find_element, find_all_elements
+from .config import SELECTORS, SELECTOR_UNIONS, TIMEOUT, BAIDU_URL, DEBUG
+from .utils import find_element, load_selector_hints, save_selector_hints
+
+# 预合并的 CSS 组选择器统一取自 config.SELECTOR_UNIONS（import 时算一次）：
+# 浏览器端单次 querySelector 即可命中任一候选。注意组选择器按文档序取第一个
+# 匹配、不保证候选优先级，因此只用于"谁命中都行"的点击路径；需要优先级/
+# 调试命中信息的热路径仍走页面内按序遍历。
+_UPLOAD_BTN_GROUP = SELECTOR_UNIONS["image_upload_button"]
+_NEW_CHAT_SELECTORS = [
+    'button[aria-label*="新对话"]',
+    'button[aria-label*="新建"]',
+    '[class*="new-chat"]',
+    '[class*="newChat"]',
+]
+_NEW_CHAT_GROUP = ",".join(_NEW_CHAT_SELECTORS)
+
+# 常驻助手（见 _stealth.CHAT_HELPERS_JS）的轻量调用入口：每拍只发一行
+# 调用 + 参数。助手未注入时返回 null，由 Python 侧退回完整脚本。
+# 有效结果都包在 {v: ...} 里，以便与"助手缺失"的 null 区分。
+_SNAPSHOT_CALL_JS = (
+    "(a) => window.__baidu"
+    " ? {v: window.__baidu.snapshot(a[0], a[1], a[2], a[3])} : null"
+)
+_FIRST_VISIBLE_CALL_JS = (
+    "(sels) => window.__baidu ? {v: window.__baidu.firstVisible(sels)} : null"
+)
+_LATEST_TEXT_CALL_JS = (
+    "(sels) => window.__baidu ? {v: window.__baidu.latestText(sels)} : null"
+)
+
+# 页面内响应完成探测器：MutationObserver 在 DOM 真正变化时刷新最新回复，
+# 页内 300ms 定时器做稳定性计数（文本连续 3 拍不变且无生成指示 → 完成），
+# 全程零 CDP 流量；Python 侧只挂一个 wait_for_function 等 __baidu_done。
+_OBSERVER_JS = """
+(args) => {
+    const [asstSels, stopSels, loadSels, pre, phrases] = args;
+    if (window.__baidu_obs) { try { window.__baidu_obs.disconnect(); } catch (e) {} }
+    if (window.__baidu_timer) { clearInterval(window.__baidu_timer); }
+    window.__baidu_done = false;
+    window.__baidu_text = '';
+
+    const vis = (el) => {
+        if (!el) return false;
+        const r = el.getBoundingClientRect();
+        const st = getComputedStyle(el);
+        return r.width > 0 && r.height > 0
+            && st.visibility !== 'hidden' && st.display !== 'none';
+    };
+    const latest = () => {
+        for (const s of asstSels) {
+            const ms = document.querySelectorAll(s);
+            if (ms.length) return ms[ms.length - 1].innerText.trim();
+        }
+        return '';
+    };
+    const generating = () => {
+        for (const s of [...stopSels, ...loadSels]) {
+            try { if (vis(document.querySelector(s))) return true; } catch (e) {}
+        }
+        return false;
+    };
+    const isLoading = (t) => t.length <= 30 && phrases.some(p => t.includes(p));
+
+    let last = '';
+    let stable = 0;
+    // MutationObserver：DOM 有真实变化时立刻刷新文本、清零稳定计数
+    const obs = new MutationObserver(() => {
+        const t = latest();
+        if (t !== last) { last = t; stable = 0; }
+    });
+    obs.observe(document.body, {
+        subtree: true, childList: true, characterData: true,
+        attributes: true,
+        attributeFilter: ['class', 'disabled', 'hidden', 'aria-hidden'],
+    });
+    window.__baidu_obs = obs;
+    // 稳定性计数走页内定时器（DOM 停止变化后 observer 不再触发）
+    window.__baidu_timer = setInterval(() => {
+        const t = latest();
+        if (!t || t === pre || isLoading(t)) { last = t; stable = 0; return; }
+        window.__baidu_text = t;
+        if (t === last && !generating()) {
+            if (++stable >= 3) {
+                window.__baidu_done = true;
+                clearInterval(window.__baidu_timer);
+                obs.disconnect();
+                // 注册过推送通道时主动回调 Python（真推送，免轮询）
+                if (window.__baidu_on_done) {
+                    try { window.__baidu_on_done(window.__baidu_text); } catch (e) {}
+                }
+            }
+        } else {
+            last = t;
+            stable = 0;
+        }
+    }, 300);
+}
+"""
+
+# 批量可见性探测：一次 evaluate 在页面内扫完所有候选选择器，
+# 返回第一个可见命中的选择器字符串（把 N 次 CDP 往返压成 1 次）
+_FIRST_VISIBLE_JS = """
+(sels) => {
+    for (const s of sels) {
+        try {
+            const e = document.querySelector(s);
+            if (e) {
+                const r = e.getBoundingClientRect();
+                const st = getComputedStyle(e);
+                if (r.width && r.height && st.visibility !== 'hidden'
+                    && st.display !== 'none') return s;
+            }
+        } catch (err) {}
+    }
+    return null;
+}
+"""
+
+# 单拍快照：最新回复文本 + 生成中标志 + 与发送前内容的 diff，
+# 一次 evaluate 返回，代替每拍 _is_generating + _get_latest_response
+# 的多次 CDP 往返（也消除两次查询之间生成状态翻转的竞态）
+_SNAPSHOT_JS = """
+(args) => {
+    const [asstSels, stopSels, loadSels, pre] = args;
+    let text = '';
+    for (const s of asstSels) {
+        const ms = document.querySelectorAll(s);
+        if (ms.length) { text = ms[ms.length - 1].innerText.trim(); break; }
+    }
+    const vis = (el) => {
+        if (!el) return false;
+        const r = el.getBoundingClientRect();
+        const st = getComputedStyle(el);
+        return r.width > 0 && r.height > 0
+            && st.visibility !== 'hidden' && st.display !== 'none';
+    };
+    let gen = false;
+    for (const s of [...stopSels, ...loadSels]) {
+        try { if (vis(document.querySelector(s))) { gen = true; break; } } catch (e) {}
+    }
+    return {text, gen, changed: text !== pre};
+}
+"""
+
+# 任一选择器命中即返回其字符串（配合 polling="raf" 每帧检查，
+# 是 Playwright 移除 mutation 轮询后最接近"DOM 一变就醒"的等法）
+_ANY_SELECTOR_JS = """
+(sels) => {
+    for (const s of sels) {
+        try { const e = document.querySelector(s); if (e) return s; } catch (err) {}
+    }
+    return null;
+}
+"""
+
+# 诊断脚本：dump 输入区域附近所有可点击元素（仅错误路径使用）。
+# 和上面的热路径脚本一样提为模块常量：源码只解析/驻留一次，
+# Playwright 端也按源码哈希复用编译结果
+_DUMP_INPUT_JS = """() => {
+    const results = [];
+    // 查找输入区域容器
+    const container = document.querySelector('[class*="chat-input"]')
+        || document.querySelector('textarea')?.parentElement?.parentElement?.parentElement;
+    if (!container) {
+        return ['未找到输入区域容器'];
+    }
+    // 遍历容器及其父元素中的所有可点击元素
+    const root = container.parentElement || container;
+    const clickables = root.querySelectorAll('button, a, [role="button"], svg, [onclick], div[class*="btn"], div[class*="icon"], span[class*="btn"], span[class*="icon"]');
+    clickables.forEach(el => {
+        const tag = el.tagName.toLowerCase();
+        const cls = el.className && typeof el.className === 'string' ? el.className : '';
+        const aria = el.getAttribute('aria-label') || '';
+        const title = el.getAttribute('title') || '';
+        const text = el.textContent?.trim()?.substring(0, 20) || '';
+        results.push(`<${tag}> class="${cls}" aria="${aria}" title="${title}" text="${text}"`);
+    });
+    return results;
+}"""
+
+# 卸载探测器（提前退出/异常路径用）
+_OBSERVER_CLEANUP_JS = """
+() => {
+    if (window.__baidu_obs) { try { window.__baidu_obs.disconnect(); } catch (e) {} }
+    if (window.__baidu_timer) { clearInterval(window.__baidu_timer); }
+}
+"""
+
+# page id → 当前活跃的 BaiduChat。expose_function 的回调在 page 生命周期内
+# 只注册一次，经此注册表转发，同一 page 上重建实例后推送仍指向新实例。
+# 弱值引用：实例随管理方释放后条目自动清除，不延长其生命周期。
+_PUSH_TARGETS: "weakref.WeakValueDictionary[int, BaiduChat]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _dispatch_push(page_id: int, text: str) -> None:
+    target = _PUSH_TARGETS.get(page_id)
+    if target is not None:
+        target._on_response_done(text)
 
 
 class BaiduChat:
@@ -13,20 +215,151 @@ class BaiduChat:
 
     # 已知的加载/处理状态文本（非真正的 AI 回复，应跳过）
     LOADING_PHRASES = ["图片解析中", "理解问题", "思考中", "分析中", "搜索中", "生成中"]
+    # 预编译为单个正则交替：每拍一次 C 实现的扫描，代替逐短语 in 判断
+    _LOADING_RE = re.compile("|".join(re.escape(p) for p in LOADING_PHRASES))
 
     def __init__(self, page: Page):
         self.page = page
-        self._input_selector = None
-        self._stop_selector = None       # 缓存首次命中的停止按钮选择器
-        self._loading_selector = None    # 缓存首次命中的加载指示器选择器
-        self._response_selector = None   # 缓存首次命中的回复消息选择器
+        # 会话里是否已有历史回复：False 时发送前基线必为空，省一次查询
+        self._conversation_dirty = False
+        # 上次运行命中的选择器（磁盘缓存）：命中项提到候选列表最前，
+        # 跨进程复用"已验证"的选择器；页面改版时命中项落空自动重扫
+        self._selector_hints = load_selector_hints()
+        # 推送通道：页面完成回调 __baidu_on_done → asyncio.Event
+        self._push_ready = False
+        self._done_event: Optional[asyncio.Event] = None
+        self._push_text = ""
+
+    def _on_response_done(self, text: str) -> None:
+        """页面侧完成回调（经 _PUSH_TARGETS 注册表转发）"""
+        self._push_text = text or ""
+        if self._done_event is not None:
+            self._done_event.set()
+
+    async def _ensure_push_channel(self) -> None:
+        """注册页面 → Python 的完成推送回调（每个 page 一次）
+
+        expose_function 在一个 page 上只能注册一次，注册的闭包只捕获
+        page id，经模块级注册表转发给当前活跃实例——同一 page 上重建
+        BaiduChat 后，把注册表指向新实例即可，推送仍然可达。
+        """
+        pid = id(self.page)
+        _PUSH_TARGETS[pid] = self
+        if self._push_ready:
+            return
+        try:
+            await self.page.expose_function(
+                "__baidu_on_done",
+                lambda text, _pid=pid: _dispatch_push(_pid, text),
+            )
+            self._push_ready = True
+        except Exception as e:
+            # 同名函数已注册（同一 page 上重建 BaiduChat）：上面已把
+            # 注册表指向本实例，旧闭包会转发过来，通道照常可用
+            if "already registered" in str(e):
+                self._push_ready = True
+            elif DEBUG:
+                print(f"  [DEBUG] 推送通道注册失败，将使用 wait_for_function: {e}")
+
+    async def _snapshot(self, pre: str) -> dict:
+        """单次往返取回 {text, gen, changed} 页面快照"""
+        args = [
+            SELECTORS["assistant_message"],
+            SELECTORS["stop_button"],
+            SELECTORS["loading"],
+            pre,
+        ]
+        try:
+            wrapped = await self.page.evaluate(_SNAPSHOT_CALL_JS, args)
+            if wrapped is not None:
+                return wrapped["v"]
+            # 助手未注入（非本项目创建的页面等），退回完整脚本
+            return await self.page.evaluate(_SNAPSHOT_JS, args)
+        except Exception:
+            return {"text": "", "gen": False, "changed": False}
+
+    # Playwright 专有语法，document.querySelector 不认识
+    _SPECIAL_TOKENS = (":has-text(", ":text(", "text=", ">>")
 
-    async def _quick_find(self, selectors: list[str], label: str = "") -> tuple:
-        """快速查找元素：先即时扫描全部选择器（0ms），找不到再短暂等待
+    async def _wait_selector_raf(self, selectors: list[str], timeout: int) -> tuple:
+        """raf 轮询等待任一选择器出现（所有候选共享超时预算）
+
+        标准 CSS 选择器在页面内用一次 wait_for_function 竞速（每帧检查）；
+        Playwright 专有语法（text= / :has-text 等）退回逐个短超时探测。
+
+        Returns:
+            (element, selector) 或 (None, None)
+        """
+        css = [s for s in selectors
+               if not any(tok in s for tok in self._SPECIAL_TOKENS)]
+        special = [s for s in selectors
+                   if any(tok in s for tok in self._SPECIAL_TOKENS)]
+        deadline = time.monotonic() + timeout / 1000
+
+        while True:
+            remaining = (deadline - time.monotonic()) * 1000
+            if remaining <= 0:
+                return None, None
+
+            if css:
+                try:
+                    handle = await self.page.wait_for_function(
+                        _ANY_SELECTOR_JS,
+                        arg=css,
+                        timeout=min(500, remaining) if special else remaining,
+                        polling="raf",
+                    )
+                    sel = await handle.json_value()
+                    if sel:
+                        el = await self.page.query_selector(sel)
+                        if el:
+                            return el, sel
+                except Exception:
+                    pass
+
+            # 专有语法选择器并发探测：N 个候选共享一段等待窗口，
+            # 全部未命中的代价从 N×300ms 降到一个窗口；结果仍按
+            # 候选顺序取第一个命中，优先级不变
+            if special:
+                remaining = (deadline - time.monotonic()) * 1000
+                if remaining <= 0:
+                    return None, None
+                results = await asyncio.gather(
+                    *(self.page.wait_for_selector(s, timeout=min(300, remaining))
+                      for s in special),
+                    return_exceptions=True,
+                )
+                for sel, r in zip(special, results):
+                    if r is not None and not isinstance(r, BaseException):
+                        return r, sel
+
+            if not css and not special:
+                return None, None
+
+    async def _first_visible(self, selectors: list[str]) -> Optional[str]:
+        """批量探测选择器，返回第一个可见命中的选择器（单次 CDP 往返）"""
+        try:
+            wrapped = await self.page.evaluate(_FIRST_VISIBLE_CALL_JS, selectors)
+            if wrapped is not None:
+                return wrapped["v"]
+            return await self.page.evaluate(_FIRST_VISIBLE_JS, selectors)
+        except Exception:
+            return None
+
+    def _record_selector_hit(self, cache_key: str, sel: str) -> None:
+        """记录命中的选择器到磁盘缓存（仅在变化时落盘）"""
+        if self._selector_hints.get(cache_key) != sel:
+            self._selector_hints[cache_key] = sel
+            save_selector_hints(self._selector_hints)
+
+    async def _quick_find(self, selectors: list[str], label: str = "",
+                          cache_key: str = None) -> tuple:
+        """快速查找元素：先批量即时扫描（1 次往返），找不到再短暂等待
 
         Args:
             selectors: 候选选择器列表
             label: DEBUG 日志标签（如 "输入框"、"发送按钮"）
+            cache_key: 选择器缓存键；传入时上次命中项优先探测并持久化本次命中
 
         Returns:
             (element, selector) 或 (None, None)
@@ -34,43 +367,45 @@ class BaiduChat:
         if DEBUG and label:
             print(f"  [DEBUG] === 扫描{label}选择器 ===")
 
-        # 第一轮：即时查询，不等待
-        for sel in selectors:
-            try:
-                el = await self.page.query_selector(sel)
-                if el:
-                    if DEBUG:
-                        print(f"  [DEBUG]   ✓ {sel}")
-                    return el, sel
-                else:
-                    if DEBUG:
-                        print(f"  [DEBUG]   ✗ {sel}")
-            except Exception as e:
+        # 上次命中的选择器提前：跨运行复用已验证命中，避免落到后备项
+        if cache_key:
+            hint = self._selector_hints.get(cache_key)
+            if hint in selectors and selectors[0] != hint:
+                selectors = [hint] + [s for s in selectors if s != hint]
+
+        # 第一轮：页面内批量即时查询，不等待
+        sel = await self._first_visible(selectors)
+        if sel:
+            el = await self.page.query_selector(sel)
+            if el:
                 if DEBUG:
-                    print(f"  [DEBUG]   ✗ {sel} (异常: {e})")
-                continue
+                    print(f"  [DEBUG]   ✓ {sel}")
+                if cache_key:
+                    self._record_selector_hit(cache_key, sel)
+                return el, sel
 
-        # 第二轮：短暂等待（元素可能还在渲染）
+        # 第二轮：短暂等待（元素可能还在渲染），raf 轮询竞速全部候选
         if DEBUG and label:
             print(f"  [DEBUG]   即时扫描未命中，等待重试...")
-        for sel in selectors:
-            try:
-                el = await self.page.wait_for_selector(sel, timeout=500)
-                if el:
-                    if DEBUG:
-                        print(f"  [DEBUG]   ✓ (等待后) {sel}")
-                    return el, sel
-            except Exception:
-                continue
+        el, sel = await self._wait_selector_raf(selectors, timeout=1000)
+        if el:
+            if DEBUG:
+                print(f"  [DEBUG]   ✓ (等待后) {sel}")
+            if cache_key:
+                self._record_selector_hit(cache_key, sel)
+            return el, sel
 
         return None, None
 
-    async def _check_message_sent(self, input_box, pre_content: str) -> bool:
-        """多策略检测消息是否已发送成功
+    async def _check_message_sent(self, input_box, pre_content: str,
+                                  snap: Optional[dict] = None) -> bool:
+        """多策略检测消息是否已发送成功（廉价优先，最多 2 次往返）
 
         策略1: 输入框被清空（JS evaluate 比 input_value() 更可靠）
-        策略2: AI 开始生成（停止按钮/加载指示器）
-        策略3: 新的回复内容出现（与发送前不同）
+        策略2+3 合并为一次快照：AI 开始生成 / 新回复内容出现
+
+        Args:
+            snap: 调用方本拍已取到的 _snapshot 结果，传入可省一次往返
         """
         # 策略1: 输入框被清空
         try:
@@ -82,15 +417,14 @@ class BaiduChat:
         except Exception:
             pass
 
-        # 策略2: AI 开始生成
-        if await self._is_generating():
+        # 策略2+3：生成状态与最新内容一次快照取回
+        if snap is None:
+            snap = await self._snapshot(pre_content)
+        if snap["gen"]:
             if DEBUG:
                 print("  [DEBUG] 检测到 AI 开始生成")
             return True
-
-        # 策略3: 新回复内容出现
-        current = await self._get_latest_response()
-        if current and current != pre_content:
+        if snap["text"] and snap["text"] != pre_content:
             if DEBUG:
                 print("  [DEBUG] 检测到新回复内容出现")
             return True
@@ -105,21 +439,18 @@ class BaiduChat:
             _image_pending: 内部参数，图片上传后调用时为 True，
                             启用周期性回车重试（图片可能未就绪）
         """
-        t_start = time.time()
+        t_start = time.perf_counter()
 
         print(f"→ 发送消息: {prompt[:50]}{'...' if len(prompt) > 50 else ''}")
 
-        # 查找输入框（有缓存直接用，否则快速扫描）
-        input_box = None
-        if self._input_selector:
-            input_box = await self.page.query_selector(self._input_selector)
-
-        if not input_box:
-            input_box, self._input_selector = await self._quick_find(SELECTORS["input_box"], "输入框")
+        # 查找输入框（批量即时扫描，页内 querySelector 亚毫秒级，无需缓存）
+        input_box, input_selector = await self._quick_find(
+            SELECTORS["input_box"], "输入框", cache_key="input_box"
+        )
 
         if not input_box:
             # 最后兜底：用 wait_for_selector 等页面加载
-            input_box, self._input_selector = await find_element(
+            input_box, input_selector = await find_element(
                 self.page, SELECTORS["input_box"], timeout=TIMEOUT["element"]
             )
 
@@ -127,7 +458,7 @@ class BaiduChat:
             raise Exception("找不到输入框，请检查页面是否加载完成或更新选择器配置")
 
         if DEBUG:
-            print(f"  [DEBUG] 输入框选择器: {self._input_selector}")
+            print(f"  [DEBUG] 输入框选择器: {input_selector}")
 
         # 清空并输入 — fill() 最快，直接设置 value
         await input_box.click()
@@ -139,10 +470,11 @@ class BaiduChat:
             await self.page.keyboard.type(prompt, delay=0)
 
         if DEBUG:
-            print(f"  [TIMING] 输入消息: {time.time() - t_start:.1f}s")
+            print(f"  [TIMING] 输入消息: {time.perf_counter() - t_start:.1f}s")
 
         # 发送前记录页面已有内容，用于区分新旧响应
-        pre_content = await self._get_latest_response()
+        # （全新会话基线必为空，跳过这次查询）
+        pre_content = await self._get_latest_response() if self._conversation_dirty else ""
         if pre_content:
             print(f"  [DEBUG] 发送前页面已有内容: {pre_content[:80]!r}")
 
@@ -151,18 +483,48 @@ class BaiduChat:
         await input_box.click()  # 确保焦点在输入框
 
         if _image_pending:
-            # 图片场景：周期性回车，图片可能还没真正就绪
-            for attempt in range(20):  # 最多 20 × 0.3s = 6s
-                await self.page.keyboard.press("Enter")
-                if DEBUG and attempt == 0:
-                    print("  [DEBUG] 按回车发送（图片模式，周期重试）")
-                await asyncio.sleep(0.3)
+            # 图片场景：先等预览元素脱离 loading/uploading/pending 状态
+            # （raf 轮询，就绪即醒），然后只按一次回车，
+            # 代替盲目周期性敲回车
+            image_ready = False
+            try:
+                await self.page.wait_for_function(
+                    "(sels) => { for (const s of sels) {"
+                    " const e = document.querySelector(s);"
+                    " if (e && !(typeof e.className === 'string'"
+                    " && /loading|uploading|pending/i.test(e.className)))"
+                    " return true; }"
+                    " return false; }",
+                    arg=SELECTORS["image_preview"],
+                    timeout=10000,
+                    polling="raf",
+                )
+                image_ready = True
+            except Exception:
+                if DEBUG:
+                    print("  [DEBUG] 未等到图片就绪信号，退回周期回车")
 
-                if await self._check_message_sent(input_box, pre_content):
+            t_retry = time.monotonic()
+            delay = 0.1
+            attempt = 0
+            while time.monotonic() - t_retry < 6:
+                attempt += 1
+                await self.page.keyboard.press("Enter")
+                if DEBUG and attempt == 1:
+                    print("  [DEBUG] 按回车发送"
+                          + ("（图片已就绪）" if image_ready else "（图片模式，周期重试）"))
+
+                # 确认检测与退避 sleep 并发跑，检测耗时被 sleep 掩盖
+                _, ok = await asyncio.gather(
+                    asyncio.sleep(delay),
+                    self._check_message_sent(input_box, pre_content),
+                )
+                if ok:
                     sent = True
-                    if DEBUG and attempt > 0:
-                        print(f"  [DEBUG] 第 {attempt + 1} 次回车后发送成功")
+                    if DEBUG and attempt > 1:
+                        print(f"  [DEBUG] 第 {attempt} 次回车后发送成功")
                     break
+                delay = min(delay * 2, 0.6)
         else:
             # 纯文本场景：按一次回车，短暂确认即可
             await self.page.keyboard.press("Enter")
@@ -170,8 +532,12 @@ class BaiduChat:
                 print("  [DEBUG] 按回车发送")
 
             for i in range(5):  # 最多等 5 × 0.3s = 1.5s 确认
-                await asyncio.sleep(0.3)
-                if await self._check_message_sent(input_box, pre_content):
+                # sleep 与确认检测并发，单轮耗时 ≈ max(0.3s, 检测耗时)
+                _, ok = await asyncio.gather(
+                    asyncio.sleep(0.3),
+                    self._check_message_sent(input_box, pre_content),
+                )
+                if ok:
                     sent = True
                     break
 
@@ -180,17 +546,18 @@ class BaiduChat:
             if DEBUG:
                 print("  [DEBUG] 未明确检测到发送，假定已发送继续等待响应")
 
-        t_sent = time.time()
+        t_sent = time.perf_counter()
         if DEBUG:
             print(f"  [TIMING] 发送消息: {t_sent - t_start:.1f}s")
 
         print("→ 等待 AI 响应...")
 
         # 等待响应完成（跳过发送前已有的内容）
+        self._conversation_dirty = True
         response = await self._wait_for_response_complete(pre_content)
         if DEBUG:
-            print(f"  [TIMING] 等待响应: {time.time() - t_sent:.1f}s")
-            print(f"  [TIMING] send_message 总耗时: {time.time() - t_start:.1f}s")
+            print(f"  [TIMING] 等待响应: {time.perf_counter() - t_sent:.1f}s")
+            print(f"  [TIMING] send_message 总耗时: {time.perf_counter() - t_start:.1f}s")
 
         return response
 
@@ -203,48 +570,121 @@ class BaiduChat:
         text = text.strip()
         if len(text) > 30:
             return False
-        return any(phrase in text for phrase in self.LOADING_PHRASES)
+        return bool(self._LOADING_RE.search(text))
+
+    async def _install_response_observer(self, pre_content: str) -> None:
+        """在页面内安装响应完成探测器（MutationObserver + 页内定时器）"""
+        await self.page.evaluate(_OBSERVER_JS, [
+            SELECTORS["assistant_message"],
+            SELECTORS["stop_button"],
+            SELECTORS["loading"],
+            pre_content,
+            self.LOADING_PHRASES,
+        ])
 
     async def _wait_for_response_complete(self, pre_content: str = "") -> str:
-        """等待响应完成并返回内容（参考 qwen 逻辑 + 加载状态过滤）
+        """等待响应完成并返回内容
 
-        核心逻辑：内容稳定 + 未在生成 → 完成
-        额外处理：跳过"图片解析中"等加载状态文本，等待真正的回复出现
+        优先走页面 → Python 真推送：expose_function 注册完成回调，
+        页内探测器判定稳定后主动调用，Python 侧只 await 一个
+        asyncio.Event，空闲期零 CDP 流量、零轮询。回调注册不可用时
+        降级为 wait_for_function 等 __baidu_done；探测器安装失败
+        （页面异常等）再退回原轮询方案。
 
         Args:
             pre_content: 发送前页面已有的内容，用于跳过旧内容
         """
-        t_start = time.time()
-        t_first_content = None
-        last_content = ""
-        stable_count = 0
-        max_stable = 3          # 内容稳定 0.9s 即认为完成（3 × 0.3s）
-        check_interval = 0.3
-        timeout_ms = TIMEOUT["response_wait"]
-        max_checks = int(timeout_ms / (check_interval * 1000))
+        t_start = time.perf_counter()
+        await self._ensure_push_channel()
+        self._done_event = asyncio.Event()
+        self._push_text = ""
+        try:
+            await self._install_response_observer(pre_content)
+        except Exception as e:
+            if DEBUG:
+                print(f"  [DEBUG] 探测器安装失败，退回轮询: {e}")
+            return await self._wait_for_response_polling(pre_content)
 
-        for i in range(max_checks):
-            # 检查是否有停止按钮或加载指示器（即时查询，不等待）
-            is_generating = await self._is_generating()
+        try:
+            if self._push_ready:
+                await asyncio.wait_for(
+                    self._done_event.wait(),
+                    timeout=TIMEOUT["response_wait"] / 1000,
+                )
+                content = (self._push_text or "").strip()
+                if not content:
+                    content = (await self.page.evaluate("window.__baidu_text") or "").strip()
+            else:
+                await self.page.wait_for_function(
+                    "() => window.__baidu_done", timeout=TIMEOUT["response_wait"]
+                )
+                content = (await self.page.evaluate("window.__baidu_text") or "").strip()
+            if content:
+                if DEBUG:
+                    print(f"  [TIMING] 响应完成(推送): {time.perf_counter() - t_start:.1f}s")
+                print("✓ 响应完成")
+                return content
+        except Exception:
+            # 超时：返回已到达的部分内容，和轮询路径行为一致
+            try:
+                partial = (await self.page.evaluate("window.__baidu_text") or "").strip()
+            except Exception:
+                partial = ""
+            if partial:
+                print("  [WARN] 响应超时，返回当前内容")
+                return partial
+            raise Exception("获取响应超时")
+        finally:
+            try:
+                await self.page.evaluate(_OBSERVER_CLEANUP_JS)
+            except Exception:
+                pass
 
-            # 获取最新回复内容
-            current_content = await self._get_latest_response()
+        # done 置位但没有文本（异常边界），退回轮询兜底
+        return await self._wait_for_response_polling(pre_content)
 
-            # 跳过发送前已有的内容
-            if current_content and current_content == pre_content:
-                await asyncio.sleep(check_interval)
-                continue
+    async def _wait_for_response_polling(self, pre_content: str = "") -> str:
+        """轮询版等待响应（推送探测器不可用时的兜底）
 
-            # 跳过加载状态文本（如"图片解析中"、"理解问题"）
-            if current_content and self._is_loading_text(current_content):
-                if DEBUG and t_first_content is None:
+        核心逻辑：内容稳定 + 未在生成 → 完成
+        额外处理：跳过"图片解析中"等加载状态文本，等待真正的回复出现
+        """
+        t_start = time.monotonic()
+        t_first_content = None
+        last_content = ""
+        stable_count = 0
+        max_stable = 3          # 内容连续稳定 3 轮即认为完成
+        timeout_s = TIMEOUT["response_wait"] / 1000
+        # 指数退避：50ms 起步，×1.6 增长，封顶 800ms；内容一变就回到 50ms。
+        # 早期密集探测压低首 token 检测延迟，长尾阶段减少无效轮询。
+        delay = 0.05
+        checks = 0
+
+        while time.monotonic() - t_start < timeout_s:
+            checks += 1
+            # 生成状态 + 最新内容 + diff 一次快照取回（单次 CDP 往返）
+            snap = await self._snapshot(pre_content)
+            # 让出事件循环一拍（sleep(0) 走快速路径）：已就绪的协程——
+            # 浏览器事件分发、expose_function 推送回调——先于本轮决策执行
+            await asyncio.sleep(0)
+            is_generating = snap["gen"]
+            current_content = snap["text"]
+
+            # 跳过发送前已有的内容 / 加载状态文本（如"图片解析中"）
+            if current_content and (
+                current_content == pre_content
+                or self._is_loading_text(current_content)
+            ):
+                if (DEBUG and t_first_content is None
+                        and current_content != pre_content):
                     print(f"  [DEBUG] 跳过加载状态文本: {current_content!r}")
-                await asyncio.sleep(check_interval)
+                await asyncio.sleep(delay)
+                delay = min(delay * 1.6, 0.8)
                 continue
 
             if current_content:
                 if t_first_content is None:
-                    t_first_content = time.time()
+                    t_first_content = time.monotonic()
                     if DEBUG:
                         print(f"  [TIMING] 首次检测到新内容: {t_first_content - t_start:.1f}s")
                     print(f"  [DEBUG] 新内容预览: {current_content[:80]!r}")
@@ -253,14 +693,16 @@ class BaiduChat:
                     stable_count += 1
                     if stable_count >= max_stable:
                         if DEBUG:
-                            print(f"  [TIMING] 内容稳定确认: {time.time() - t_start:.1f}s (检查 {i+1} 轮)")
+                            print(f"  [TIMING] 内容稳定确认: {time.monotonic() - t_start:.1f}s (检查 {checks} 轮)")
                         print("✓ 响应完成")
                         return current_content
                 else:
                     stable_count = 0
                     last_content = current_content
+                    delay = 0.05  # 内容还在变，回到密集探测
 
-            await asyncio.sleep(check_interval)
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.6, 0.8)
 
         # 超时但有内容，返回当前内容
         if last_content:
@@ -272,82 +714,55 @@ class BaiduChat:
     async def _is_generating(self) -> bool:
         """检查是否正在生成响应
 
-        使用即时 query_selector 代替 wait_for_selector，
-        避免每次调用耗费 ~1 秒的超时等待。
+        停止按钮 + 加载指示器合并为一次批量探测（1 次 CDP 往返，
+        可见性在页面内判断），代替逐选择器 query_selector + is_visible。
         """
-        # 检查停止按钮
-        for selector in SELECTORS["stop_button"]:
-            try:
-                el = await self.page.query_selector(selector)
-                if el and await el.is_visible():
-                    if self._stop_selector != selector and DEBUG:
-                        print(f"  [DEBUG] 停止按钮命中: {selector}")
-                        self._stop_selector = selector
-                    return True
-            except Exception:
-                continue
-
-        # 检查加载指示器
-        for selector in SELECTORS["loading"]:
-            try:
-                el = await self.page.query_selector(selector)
-                if el and await el.is_visible():
-                    if self._loading_selector != selector and DEBUG:
-                        print(f"  [DEBUG] 加载指示器命中: {selector}")
-                        self._loading_selector = selector
-                    return True
-            except Exception:
-                continue
-
-        return False
+        hit = await self._first_visible(
+            SELECTORS["stop_button"] + SELECTORS["loading"]
+        )
+        return hit is not None
 
     async def _get_latest_response(self) -> str:
-        """获取最新的 AI 回复内容"""
-        messages, selector = await find_all_elements(
-            self.page,
-            SELECTORS["assistant_message"]
-        )
+        """获取最新的 AI 回复内容
 
-        if messages:
-            if self._response_selector != selector and DEBUG:
-                print(f"  [DEBUG] 回复消息选择器命中: {selector}")
-                self._response_selector = selector
-            last_message = messages[-1]
-            try:
-                content = await last_message.inner_text()
-                return content.strip()
-            except Exception:
-                return ""
-        return ""
+        单次 evaluate 直接在页面内取最后一条消息文本，只回传字符串；
+        不再枚举全部消息的 ElementHandle（每个句柄都是一次协议对象分配）。
+        """
+        try:
+            wrapped = await self.page.evaluate(
+                _LATEST_TEXT_CALL_JS, SELECTORS["assistant_message"]
+            )
+            if wrapped is not None:
+                return wrapped["v"] or ""
+            return await self.page.evaluate(
+                "(sels) => { for (const s of sels) {"
+                " const ms = document.querySelectorAll(s);"
+                " if (ms.length) return ms[ms.length - 1].innerText.trim(); }"
+                " return ''; }",
+                SELECTORS["assistant_message"],
+            ) or ""
+        except Exception:
+            return ""
 
     async def _dump_input_area_elements(self) -> None:
         """诊断：dump 输入区域附近所有可点击元素的标签、class、aria-label"""
         print("  [DEBUG] === 诊断：输入区域附近的可点击元素 ===")
-        elements = await self.page.evaluate("""() => {
-            const results = [];
-            // 查找输入区域容器
-            const container = document.querySelector('[class*="chat-input"]')
-                || document.querySelector('textarea')?.parentElement?.parentElement?.parentElement;
-            if (!container) {
-                return ['未找到输入区域容器'];
-            }
-            // 遍历容器及其父元素中的所有可点击元素
-            const root = container.parentElement || container;
-            const clickables = root.querySelectorAll('button, a, [role="button"], svg, [onclick], div[class*="btn"], div[class*="icon"], span[class*="btn"], span[class*="icon"]');
-            clickables.forEach(el => {
-                const tag = el.tagName.toLowerCase();
-                const cls = el.className && typeof el.className === 'string' ? el.className : '';
-                const aria = el.getAttribute('aria-label') || '';
-                const title = el.getAttribute('title') || '';
-                const text = el.textContent?.trim()?.substring(0, 20) || '';
-                results.push(`<${tag}> class="${cls}" aria="${aria}" title="${title}" text="${text}"`);
-            });
-            return results;
-        }""")
+        elements = await self.page.evaluate(_DUMP_INPUT_JS)
         for el in elements:
             print(f"    {el}")
         print("  [DEBUG] === 诊断结束 ===")
 
+    async def _prewarm_input(self) -> None:
+        """预热输入区域：等输入框渲染就绪（只读等待，无副作用）
+
+        与 upload_image 并行调用，使后续 send_message 的输入框查找
+        直接命中即时扫描，不再落进等待重试分支。
+        """
+        try:
+            await self._wait_selector_raf(SELECTORS["input_box"], timeout=5000)
+        except Exception:
+            pass
+
     async def upload_image(self, image_path: str) -> bool:
         """上传图片
 
@@ -359,40 +774,39 @@ class BaiduChat:
         Returns:
             是否上传成功
         """
-        if not Path(image_path).exists():
+        # stat 丢线程池：慢盘/NFS 上的阻塞不拖累事件循环
+        if not await asyncio.to_thread(Path(image_path).exists):
             print(f"  ✗ 图片文件不存在: {image_path}")
             return False
 
         print(f"→ 上传图片: {image_path}")
-        t_upload_start = time.time()
+        t_upload_start = time.perf_counter()
 
+        # 指数退避 + ±20% 抖动；最后一次失败后不再白等
+        retry_delays = [0.3, 0.8, 1.8]
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                # 1. 点击图片上传按钮
-                img_btn, selector = await find_element(
-                    self.page,
-                    SELECTORS["image_upload_button"],
-                    timeout=5000,
-                    debug=DEBUG and attempt == 0
-                )
-                if not img_btn:
+                # 1. 点击图片上传按钮（Locator 合并候选为 CSS 组选择器，
+                # 查找 + 自动等待 + 点击一体，不经手 ElementHandle）
+                img_btn = self.page.locator(_UPLOAD_BTN_GROUP).first
+                try:
+                    await img_btn.click(timeout=5000)
+                except Exception:
                     # 诊断：dump 输入区域附近的可点击元素，帮助定位正确选择器
                     if DEBUG:
                         await self._dump_input_area_elements()
                     print("  ✗ 找不到图片上传按钮")
                     return False
 
-                await img_btn.click()
                 if DEBUG:
-                    print(f"  [DEBUG] 点击图片上传按钮: {selector}")
+                    print("  [DEBUG] 已点击图片上传按钮")
 
                 # 2. 等待菜单出现，点击"上传本地图片"
-                menu_item, _ = await find_element(
-                    self.page,
-                    SELECTORS["upload_local_image"],
-                    timeout=3000,
-                    debug=False
+                # 首次尝试短超时快速失败；重试说明菜单动画/渲染偏慢，
+                # 每次放宽等待窗口
+                menu_item, _ = await self._wait_selector_raf(
+                    SELECTORS["upload_local_image"], timeout=3000 + attempt * 1500
                 )
 
                 if not menu_item:
@@ -402,7 +816,10 @@ class BaiduChat:
                         await self.page.mouse.click(10, 10)
                     except Exception:
                         pass
-                    await asyncio.sleep(0.5)
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(
+                            retry_delays[attempt] * random.uniform(0.8, 1.2)
+                        )
                     continue
 
                 # 3. 使用 file chooser 拦截文件选择
@@ -416,27 +833,28 @@ class BaiduChat:
                 await file_chooser.set_files(image_path)
                 print("  → 图片已选择，等待上传...")
 
-                # 5. 等待图片预览出现（即时轮询，避免 wait_for_selector 逐个超时）
+                # 5. 等待图片预览出现：单次 wait_for_function 在页面内竞速
+                # 所有候选选择器，polling="raf" 每帧检查（接近 DOM 变化推送），
+                # 代替 Python 侧 0.2s × N 选择器的轮询
                 preview = None
-                t_preview = time.time()
-                while time.time() - t_preview < 10:
-                    for sel in SELECTORS["image_preview"]:
-                        try:
-                            el = await self.page.query_selector(sel)
-                            if el:
-                                preview = el
-                                if DEBUG:
-                                    print(f"  [DEBUG] 图片预览命中: {sel}")
-                                break
-                        except Exception:
-                            continue
-                    if preview:
-                        break
-                    await asyncio.sleep(0.2)
+                try:
+                    handle = await self.page.wait_for_function(
+                        "(sels) => { for (const s of sels) {"
+                        " const e = document.querySelector(s); if (e) return s; }"
+                        " return null; }",
+                        arg=SELECTORS["image_preview"],
+                        timeout=10000,
+                        polling="raf",
+                    )
+                    preview = await handle.json_value()
+                    if preview and DEBUG:
+                        print(f"  [DEBUG] 图片预览命中: {preview}")
+                except Exception:
+                    preview = None
 
                 if preview:
                     if DEBUG:
-                        print(f"  [TIMING] 图片上传: {time.time() - t_upload_start:.1f}s")
+                        print(f"  [TIMING] 图片上传: {time.perf_counter() - t_upload_start:.1f}s")
                     print("  ✓ 图片上传完成")
                     return True
                 else:
@@ -451,7 +869,9 @@ class BaiduChat:
                         await self.page.mouse.click(10, 10)
                     except Exception:
                         pass
-                    await asyncio.sleep(1)
+                    await asyncio.sleep(
+                        retry_delays[attempt] * random.uniform(0.8, 1.2)
+                    )
                 else:
                     print(f"  ✗ 上传图片失败: {e}")
                     return False
@@ -469,42 +889,50 @@ class BaiduChat:
         Returns:
             AI 回复内容
         """
-        t_total = time.time()
-
-        # 上传图片
-        if not await self.upload_image(image_path):
+        t_total = time.perf_counter()
+
+        # 图片上传与输入框预热并行：上传耗时可达数秒，足够把
+        # 输入区域的渲染等待完全藏进去（_prewarm_input 无副作用）
+        upload_task = asyncio.create_task(self.upload_image(image_path))
+        prep_task = asyncio.create_task(self._prewarm_input())
+        uploaded = await upload_task
+        await prep_task
+        if not uploaded:
             raise Exception("图片上传失败")
 
-        # 短暂等待
-        await asyncio.sleep(0.5)
+        # 等待输入区就绪（发送按钮可用/输入框可见）代替盲等 0.5s，
+        # 条件通常 <50ms 即满足；万一等不到也只损失 2s 后照常发送
+        try:
+            await self.page.wait_for_function(
+                "(sels) => { for (const s of sels) {"
+                " const e = document.querySelector(s);"
+                " if (e && !e.disabled) return true; }"
+                " return false; }",
+                arg=SELECTORS["send_button"] + SELECTORS["input_box"],
+                timeout=2000,
+                polling="raf",
+            )
+        except Exception:
+            pass
 
         # 发送消息（图片模式：周期性回车重试，确保图片就绪后发出）
         response = await self.send_message(prompt, _image_pending=True)
         if DEBUG:
-            print(f"  [TIMING] send_message_with_image 总耗时: {time.time() - t_total:.1f}s")
+            print(f"  [TIMING] send_message_with_image 总耗时: {time.perf_counter() - t_total:.1f}s")
         return response
 
     async def new_chat(self) -> None:
         """开启新对话"""
-        # 重置缓存的选择器
-        self._input_selector = None
-
         # 尝试查找新对话按钮
-        new_chat_selectors = [
-            'button[aria-label*="新对话"]',
-            'button[aria-label*="新建"]',
-            '[class*="new-chat"]',
-            '[class*="newChat"]',
-        ]
-        btn, _ = await find_element(self.page, new_chat_selectors, timeout=3000)
-        if btn:
-            await btn.click()
-        else:
+        try:
+            await self.page.locator(_NEW_CHAT_GROUP).first.click(timeout=3000)
+        except Exception:
             # 直接导航到首页
             print("  [INFO] 未找到新对话按钮，导航到首页...")
             await self.page.goto(BAIDU_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"])
             await self.page.wait_for_load_state("networkidle", timeout=30000)
 
         # 等待输入框出现，确认页面已就绪
-        await find_element(self.page, SELECTORS["logged_in_indicator"], timeout=5000)
+        await self._wait_selector_raf(SELECTORS["logged_in_indicator"], timeout=5000)
+        self._conversation_dirty = False
         print("✓ 已开启新对话")
@@ -8,6 +8,8 @@ ROOT_DIR = Path(__file__).parent.parent
 # 状态存储路径（包含 Cookies + localStorage + sessionStorage）
 STATE_DIR = ROOT_DIR / "state"
 STATE_FILE = STATE_DIR / "baidu_state.json"
+# 上次运行命中的选择器缓存（下次启动优先探测，页面改版时自动失效重扫）
+SELECTOR_CACHE_FILE = STATE_DIR / "baidu_selectors.json"
 
 # 百度文心助手网址
 BAIDU_URL = "https://chat.baidu.com/"
@@ -111,6 +113,12 @@ SELECTORS = {
     ],
 }
 
+# import 时预拼好的 CSS 组选择器（k → "sel1,sel2,..."），供"任一命中即可"
+# 的调用点直接使用，省去热路径里的重复 join。注意：组选择器按文档序取第一个
+# 匹配、不保证候选优先级，且 Playwright 专有语法（text= / :has-text）拼进
+# 组里会让整组失效——需要优先级或含专有语法的键仍应按列表逐个处理。
+SELECTOR_UNIONS = {k: ",".join(v) for k, v in SELECTORS.items()}
+
 # 文物识别默认提示词（带图片时使用）
 ARTIFACT_PROMPT = """# Role
 文物识别专家。
@@ -122,7 +130,7 @@ ARTIFACT_PROMPT = """# Role
 1. **优先提取展签**：若有展签，严格按展签文字填写；若无展签，根据外观推断。
 2. **英文字段**：仅当展签上存在英文时填写，否则留空 ("")。
 3. **内容限制**：`description` 需精简概括（50字以内），不要写长篇故事。
-4. **格式**：仅返回 JSON，无Markdown标记。
+4. **格式**：仅返回一个 JSON 对象，包裹在 ```json ... ``` 代码块中，代码块外不要有任何文字。
 
 # JSON Structure & Definition
 {
@@ -153,4 +161,7 @@ BROWSER_CONFIG = {
         "AppleWebKit/537.36 (KHTML, like Gecko) "
         "Chrome/120.0.0.0 Safari/537.36"
     ),
+    # 路由拦截直接丢弃的资源类型（自动化不渲染给人看，图片/字体/媒体纯浪费带宽）
+    # 注意不拦 stylesheet：可见性判断（offsetParent/getComputedStyle）依赖 CSS
+    "blocked_resources": ["image", "font", "media"],
 }
@@ -1,31 +1,128 @@
 """工具函数 - 复用 qwen_client 的通用函数"""
 import json
 import re
+import sys
+
+# orjson（SIMD 加速）可选：未安装时退回标准库 json
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
 
 from qwen_client.utils import find_element, find_all_elements, save_cookies, load_cookies
 
+from .config import SELECTOR_CACHE_FILE
+
+
+def load_selector_hints() -> dict:
+    """读取上次运行命中的选择器缓存（key → 选择器字符串）
+
+    文件不存在或损坏时返回空 dict，调用方按原始优先级扫描。
+    """
+    try:
+        with open(SELECTOR_CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_selector_hints(hints: dict) -> None:
+    """持久化命中的选择器，下次启动优先探测（失败静默，缓存非关键路径）"""
+    try:
+        SELECTOR_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(SELECTOR_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(hints, f, ensure_ascii=False)
+    except Exception:
+        pass
+
+# 模块级预编译（每条回复都要走这里，免去每次查 re 内部缓存）
+_JSON_RE = re.compile(r'\{[\s\S]*\}')
+
+
+def _loads(s: str):
+    """JSON 解析：优先 orjson，缺失时用标准库
+
+    两者的解析异常（orjson.JSONDecodeError / json.JSONDecodeError）
+    都是 ValueError 子类，调用方统一按 ValueError 捕获。
+    """
+    if _orjson is not None:
+        return _orjson.loads(s)
+    return json.loads(s)
+
+
+def _scan_json_object(text: str) -> str:
+    """单遍括号计数扫描，返回第一个配平的 {...} 片段（无则返回 ''）
+
+    跟踪字符串内/转义状态，字符串里的花括号不参与计数；回复里混入
+    多个 JSON 时取第一个完整对象，而非贪婪正则跨对象的错误匹配。
+    """
+    start = text.find('{')
+    if start == -1:
+        return ''
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return ''
+
 
 def extract_json(text: str):
     """从 AI 回复中提取 JSON 对象
 
-    AI 回复可能包含 JSON 以外的多余文字，用正则提取最外层 {} 并解析。
+    AI 回复可能包含 JSON 以外的多余文字。先走 O(n) 括号计数扫描取出
+    第一个配平对象（字符串内花括号不误判、多 JSON 回复取对的那段）；
+    扫描失败时退回 find/rfind 最外层切片和正则兜底。
     """
-    # 匹配最外层 { ... }（贪婪匹配，取最长的）
-    match = re.search(r'\{[\s\S]*\}', text)
+    snippet = _scan_json_object(text)
+    if snippet:
+        try:
+            return _loads(snippet)
+        except ValueError:
+            pass
+
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end > start:
+        try:
+            return _loads(text[start:end + 1])
+        except ValueError:
+            pass
+
+    match = _JSON_RE.search(text)
     if not match:
         return None
     try:
-        return json.loads(match.group())
-    except json.JSONDecodeError:
+        return _loads(match.group())
+    except ValueError:
         return None
 
 
-def print_banner():
-    """打印启动横幅"""
-    banner = """
+# 启动横幅常量化：每次调用不再重建字符串，直接一次 write 输出
+_BANNER = """
 ╔═══════════════════════════════════════╗
 ║       Baidu AI Client                 ║
 ║   百度文心助手网页版自动化工具        ║
 ╚═══════════════════════════════════════╝
-    """
-    print(banner)
+    \n"""
+
+
+def print_banner():
+    """打印启动横幅"""
+    sys.stdout.write(_BANNER)
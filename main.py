@@ -24,7 +24,7 @@ import asyncio
 import sys
 import time
 
-from qwen_client import QwenBrowser, QwenChat, DEBUG
+from qwen_client import QwenBrowser, QwenChat, BrowserDaemon, ask_daemon, DEBUG
 from qwen_client.utils import print_banner
 
 
@@ -48,8 +48,25 @@ async def login_only():
 
 
 async def single_query(prompt: str, image_path: str = None):
-    """单次提问"""
+    """单次提问（优先走常驻守护进程，省掉浏览器冷启动）"""
     t_total = time.time()
+
+    # 守护进程在跑时直接复用它的热浏览器
+    try:
+        response = await ask_daemon(prompt, image_path)
+    except Exception as e:
+        print(f"✗ 守护进程执行失败: {e}")
+        return
+    if response is not None:
+        print("\n" + "=" * 50)
+        print("AI 回复:")
+        print("=" * 50)
+        print(response)
+        print("=" * 50)
+        if DEBUG:
+            print(f"\n  [TIMING] 守护进程路径总耗时: {time.time() - t_total:.1f}s")
+        return
+
     browser = QwenBrowser()
     try:
         t0 = time.time()
@@ -164,6 +181,11 @@ def main():
         action="store_true",
         help="进入交互模式"
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="启动常驻浏览器守护进程（之后的单次提问自动复用）"
+    )
     parser.add_argument(
         "--image", "-img",
         type=str,
@@ -174,6 +196,8 @@ def main():
 
     if args.login:
         asyncio.run(login_only())
+    elif args.daemon:
+        asyncio.run(BrowserDaemon().start())
     elif args.interactive:
         asyncio.run(interactive_mode())
     elif args.prompt:
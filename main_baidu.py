@@ -18,6 +18,8 @@ Usage:
 import argparse
 import asyncio
 import json
+import os
+import sys
 import time
 
 from baidu_client import BaiduBrowser, BaiduChat, DEBUG
@@ -25,6 +27,24 @@ from baidu_client.config import ARTIFACT_PROMPT
 from baidu_client.utils import print_banner, extract_json
 
 
+def _parse_artifact_json(response: str):
+    """解析文物识别回复中的 JSON
+
+    提示词已要求把 JSON 包在 ```json 代码块里：一次 str.find 定位代码块
+    直接 json.loads（线性扫描、无回溯），模型没按格式输出时才退回
+    extract_json 的通用提取。
+    """
+    i = response.find("```json")
+    if i >= 0:
+        j = response.find("```", i + 7)
+        if j > 0:
+            try:
+                return json.loads(response[i + 7:j].strip())
+            except ValueError:
+                pass
+    return extract_json(response)
+
+
 async def login_only():
     """仅执行登录流程"""
     browser = BaiduBrowser()
@@ -75,7 +95,7 @@ async def single_query(prompt: str, image_path: str = None):
 
         # 图片识别场景：从回复中提取 JSON
         if image_path:
-            data = extract_json(response)
+            data = _parse_artifact_json(response)
             if data:
                 print("\n" + "=" * 50)
                 print("文物识别结果 (JSON):")
@@ -102,6 +122,13 @@ async def single_query(prompt: str, image_path: str = None):
             print(f"  [TIMING]   查询(含上传): {t_done - t_query:.1f}s")
             print(f"  [TIMING]   全流程总计:   {t_done - t_total:.1f}s")
 
+        # 结果已打印完，浏览器交给内核随进程回收：os._exit 跳过
+        # browser.close() + playwright.stop() 数百毫秒的 CDP 拆连尾巴。
+        # DEBUG 下仍走 finally 的完整关闭，方便观察退出行为
+        if not DEBUG:
+            sys.stdout.flush()
+            os._exit(0)
+
     finally:
         await browser.close()
 
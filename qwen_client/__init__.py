@@ -2,7 +2,9 @@
 from .browser import QwenBrowser
 from .chat import QwenChat
 from .config import DEBUG, QWEN_URL
+from .daemon import BrowserDaemon, ask_daemon
 from .manager import BrowserManager
 
-__all__ = ['QwenBrowser', 'QwenChat', 'BrowserManager', 'DEBUG', 'QWEN_URL']
+__all__ = ['QwenBrowser', 'QwenChat', 'BrowserManager', 'BrowserDaemon',
+           'ask_daemon', 'DEBUG', 'QWEN_URL']
 __version__ = '0.1.0'
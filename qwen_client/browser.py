@@ -1,19 +1,43 @@
 """浏览器核心模块"""
 import asyncio
+import hashlib
+import json
+import logging
+import os
 import time
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 
 from .config import (
     QWEN_URL,
-    COOKIES_FILE,
     STATE_FILE,
     STATE_DIR,
+    PROFILE_DIR,
     TIMEOUT,
     SELECTORS,
+    SELECTORS_COMPOSED,
     BROWSER_CONFIG,
     DEBUG,
 )
-from .utils import find_element, save_cookies, load_cookies
+from .log import log
+from .utils import find_element, find_element_fast
+
+# 反检测脚本（launch 普通/持久化两条路径共用）
+_ANTI_DETECT_JS = """
+    // 隐藏 webdriver 属性
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    // 模拟真实的 plugins
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+
+    // 模拟真实的 languages
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['zh-CN', 'zh', 'en']
+    });
+"""
 
 
 class QwenBrowser:
@@ -25,6 +49,8 @@ class QwenBrowser:
         self.context: BrowserContext = None
         self.page: Page = None
         self._is_logged_in = False
+        # 上次落盘的 storage_state 指纹，内容未变时跳过重复写盘
+        self._state_hash = None
 
     async def launch(self, headless: bool = None) -> None:
         """启动浏览器"""
@@ -35,108 +61,128 @@ class QwenBrowser:
         print(f"→ 启动浏览器 (headless={headless})...")
 
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=headless,
-            slow_mo=BROWSER_CONFIG["slow_mo"],
-            args=BROWSER_CONFIG["args"],
-        )
 
-        # 创建上下文，设置反检测参数
-        self.context = await self.browser.new_context(
+        if BROWSER_CONFIG["persistent"]:
+            # 持久化 profile：磁盘缓存 JS bundle/字体/登录态，
+            # 二次启动的页面加载由磁盘缓存主导而非网络。
+            # profile 被独占锁定，此模式下不能再开第二个实例
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            self.context = await self.playwright.chromium.launch_persistent_context(
+                str(PROFILE_DIR),
+                headless=headless,
+                slow_mo=BROWSER_CONFIG["slow_mo"],
+                args=BROWSER_CONFIG["args"],
+                user_agent=BROWSER_CONFIG["user_agent"],
+                viewport={"width": 1280, "height": 800},
+                locale="zh-CN",
+                timezone_id="Asia/Shanghai",
+            )
+            await self.context.add_init_script(_ANTI_DETECT_JS)
+            self.page = (self.context.pages[0] if self.context.pages
+                         else await self.context.new_page())
+        else:
+            self.browser = await self.playwright.chromium.launch(
+                headless=headless,
+                slow_mo=BROWSER_CONFIG["slow_mo"],
+                args=BROWSER_CONFIG["args"],
+            )
+
+            # 创建上下文，设置反检测参数。状态文件存在时直接挂载，
+            # 省掉之后 close/重建 context 的数百毫秒 CDP 往返
+            self.context = await self._create_context(
+                storage_state=str(STATE_FILE) if STATE_FILE.exists() else None
+            )
+            self.page = await self.context.new_page()
+        log.debug("  [TIMING] 浏览器启动: %.1fs", time.time() - t_start)
+        print("✓ 浏览器已启动")
+
+    async def _create_context(self, storage_state=None) -> BrowserContext:
+        """创建带反检测脚本的上下文（storage_state 可以是路径或 dict）"""
+        context = await self.browser.new_context(
             user_agent=BROWSER_CONFIG["user_agent"],
             viewport={"width": 1280, "height": 800},
             locale="zh-CN",
             timezone_id="Asia/Shanghai",
+            storage_state=storage_state,
         )
 
         # 注入反检测脚本
-        await self.context.add_init_script("""
-            // 隐藏 webdriver 属性
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-
-            // 模拟真实的 plugins
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-
-            // 模拟真实的 languages
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['zh-CN', 'zh', 'en']
-            });
-        """)
+        await context.add_init_script(_ANTI_DETECT_JS)
+        return context
+
+    async def recycle_context(self) -> None:
+        """重建上下文，释放 Playwright 在长驻 context 上累积的对象
 
+        单个 context 处理大量请求后 Request/Response/Route 等对象只有在
+        context 重建时才会释放，RSS 会持续上涨。这里把当前登录态导出为
+        storage_state，原地换一个新 context + 新 page，登录不丢失。
+        """
+        t_start = time.time()
+        if self.browser is None:
+            # 持久化 context 不能原地重建（profile 独占），退化为重新导航
+            await self.page.goto(
+                QWEN_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"]
+            )
+            return
+        state = await self.context.storage_state()
+        old_context = self.context
+        self.context = await self._create_context(storage_state=state)
         self.page = await self.context.new_page()
-        if DEBUG:
-            print(f"  [TIMING] 浏览器启动: {time.time() - t_start:.1f}s")
-        print("✓ 浏览器已启动")
+        await old_context.close()
+        await self.page.goto(
+            QWEN_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"]
+        )
+        log.debug("  [TIMING] context 重建: %.1fs", time.time() - t_start)
 
     async def load_cookies_and_goto(self) -> bool:
         """加载状态并跳转到千问页面"""
         t_start = time.time()
 
+        # 持久化 profile 自带 cookies + 缓存，直接导航校验即可
+        if BROWSER_CONFIG["persistent"]:
+            print("→ 正在加载页面 (持久化 profile)...")
+            await self.page.goto(QWEN_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"])
+            if await self._check_logged_in():
+                self._is_logged_in = True
+                log.debug("  [TIMING] load_cookies_and_goto 总耗时: %.1fs",
+                          time.time() - t_start)
+                print("✓ 登录状态有效")
+                return True
+            print("→ 未找到登录状态，需要登录")
+            return False
+
         # 优先使用 storage_state（包含 cookies + localStorage）
+        # 状态已在 launch() 建 context 时挂载，这里只需导航 + 校验
         if STATE_FILE.exists():
             print(f"✓ 已找到状态文件: {STATE_FILE}")
-            # 需要重新创建 context 来加载 storage_state
-            await self.page.close()
-            await self.context.close()
 
-            self.context = await self.browser.new_context(
-                user_agent=BROWSER_CONFIG["user_agent"],
-                viewport={"width": 1280, "height": 800},
-                locale="zh-CN",
-                timezone_id="Asia/Shanghai",
-                storage_state=str(STATE_FILE),
-            )
-            self.page = await self.context.new_page()
-
-            # 调试：打印加载的 cookies
-            if DEBUG:
+            # 调试：打印加载的 cookies（取 cookies 本身要过一次 CDP，
+            # 用 isEnabledFor 整段跳过，而不只是省掉格式化）
+            if log.isEnabledFor(logging.DEBUG):
                 loaded_cookies = await self.context.cookies()
-                print(f"  [DEBUG] 从状态文件加载了 {len(loaded_cookies)} 个 cookies")
+                log.debug("  [DEBUG] 从状态文件加载了 %d 个 cookies", len(loaded_cookies))
                 for c in loaded_cookies[:5]:  # 只打印前5个
-                    print(f"    - {c.get('name')}: domain={c.get('domain')}")
+                    log.debug("    - %s: domain=%s", c.get("name"), c.get("domain"))
 
             t_nav = time.time()
             print("→ 正在加载页面...")
             await self.page.goto(QWEN_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"])
 
             # 不等 networkidle（SPA 持续有请求，白等），直接等关键 UI 元素出现
-            if DEBUG:
-                print(f"  [TIMING] 页面导航(domcontentloaded): {time.time() - t_nav:.1f}s")
+            log.debug("  [TIMING] 页面导航(domcontentloaded): %.1fs", time.time() - t_nav)
 
             t_login_check = time.time()
             if await self._check_logged_in():
                 self._is_logged_in = True
-                if DEBUG:
-                    print(f"  [TIMING] 登录检查: {time.time() - t_login_check:.1f}s")
-                    print(f"  [TIMING] load_cookies_and_goto 总耗时: {time.time() - t_start:.1f}s")
+                log.debug("  [TIMING] 登录检查: %.1fs", time.time() - t_login_check)
+                log.debug("  [TIMING] load_cookies_and_goto 总耗时: %.1fs",
+                          time.time() - t_start)
                 print("✓ 登录状态有效")
                 return True
             else:
                 print("✗ 状态已过期，需要重新登录")
                 return False
 
-        # 兼容旧的 cookies 文件
-        cookies = load_cookies(COOKIES_FILE)
-        if cookies:
-            if DEBUG:
-                print(f"  [DEBUG] 从文件加载了 {len(cookies)} 个 cookies")
-
-            await self.context.add_cookies(cookies)
-            print("→ 正在加载页面...")
-            await self.page.goto(QWEN_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"])
-
-            if await self._check_logged_in():
-                self._is_logged_in = True
-                print("✓ 登录状态有效")
-                return True
-            else:
-                print("✗ Cookies 已过期，需要重新登录")
-                return False
-
         print("→ 未找到登录状态，需要登录")
         await self.page.goto(QWEN_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"])
         return False
@@ -144,40 +190,45 @@ class QwenBrowser:
     async def _check_logged_in(self) -> bool:
         """检查是否已登录
 
-        优先检查正向指标（已登录元素），已登录时快速返回。
-        只有找不到正向指标时，才检查负向指标（"立即登录"按钮）。
+        正向指标（已登录元素）和负向指标（"立即登录"按钮）并发探测，
+        谁先命中谁定结论：已登录时不用等负向超时，未登录时也不用先把
+        正向指标的整段超时熬完。
         """
+        t_pos = asyncio.create_task(find_element(
+            self.page, SELECTORS["logged_in_indicator"],
+            timeout=10000, debug=DEBUG, cache_key="logged_in_indicator",
+        ))
+        t_neg = asyncio.create_task(find_element(
+            self.page, SELECTORS["not_logged_in_indicator"],
+            timeout=10000, debug=False, cache_key="not_logged_in_indicator",
+        ))
         try:
-            if DEBUG:
-                print("→ 检查登录状态...")
-
-            # 先检查正向指标（已登录才有的元素）—— 已登录时快速返回
-            element, selector = await find_element(
-                self.page,
-                SELECTORS["logged_in_indicator"],
-                timeout=10000,
-                debug=DEBUG
-            )
-            if element:
-                if DEBUG:
-                    print(f"  ✓ 检测到登录元素: {selector}")
-                return True
-
-            # 正向指标没找到，检查是否有"立即登录"按钮
-            not_logged_in, selector = await find_element(
-                self.page,
-                SELECTORS["not_logged_in_indicator"],
-                timeout=3000,
-                debug=False
-            )
-            if not_logged_in and DEBUG:
-                print(f"  ✗ 检测到未登录标识: {selector}")
+            log.debug("→ 检查登录状态...")
 
+            pending = {t_pos, t_neg}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                if t_pos in done:
+                    element, selector = t_pos.result()
+                    if element:
+                        log.debug("  ✓ 检测到登录元素: %s", selector)
+                        return True
+                if t_neg in done:
+                    not_logged_in, selector = t_neg.result()
+                    if not_logged_in:
+                        log.debug("  ✗ 检测到未登录标识: %s", selector)
+                        return False
+            # 两侧都超时未命中，视为未登录
             return False
         except Exception as e:
-            if DEBUG:
-                print(f"  ✗ 检查登录状态异常: {e}")
+            log.debug("  ✗ 检查登录状态异常: %s", e)
             return False
+        finally:
+            for t in (t_pos, t_neg):
+                if not t.done():
+                    t.cancel()
 
     async def wait_for_login(self) -> None:
         """等待用户手动登录"""
@@ -189,51 +240,57 @@ class QwenBrowser:
         try:
             print("→ 等待用户完成登录...")
 
-            # 核心逻辑：等待"立即登录"按钮消失（说明用户已登录）
-            # 使用轮询方式检测
-            import time
-            start_time = time.time()
-            timeout_seconds = TIMEOUT["login_wait"] / 1000
+            # 核心逻辑：等待"立即登录"按钮脱离 DOM（说明用户已登录）。
+            # 先定位实际挂在页面上的那个入口，再用 wait_for_selector
+            # (state="detached") 在浏览器内长等消失事件——整个人工登录
+            # 期间零轮询、零 CDP 往返，消失当帧即被唤醒
+            deadline = time.time() + TIMEOUT["login_wait"] / 1000
 
-            while (time.time() - start_time) < timeout_seconds:
-                # 检查"立即登录"按钮是否还存在
-                not_logged_in, _ = await find_element(
+            while time.time() < deadline:
+                not_logged_in, hit_sel = await find_element(
                     self.page,
                     SELECTORS["not_logged_in_indicator"],
-                    timeout=2000,
+                    timeout=3000,
                     debug=False
                 )
 
-                if not not_logged_in:
-                    # "立即登录"按钮消失了，说明已登录
-                    print("✓ 检测到登录成功（登录按钮已消失）")
-                    self._is_logged_in = True
-
-                    # 等待一段时间确保登录状态完全生效
-                    print("→ 等待登录状态稳定...")
-                    await asyncio.sleep(3)
-
-                    # 刷新页面确保状态完整
-                    await self.page.reload()
-                    await self.page.wait_for_load_state("networkidle", timeout=30000)
-                    await asyncio.sleep(2)
-
-                    # 再次确认登录状态
-                    not_logged_in_check, _ = await find_element(
-                        self.page,
-                        SELECTORS["not_logged_in_indicator"],
-                        timeout=3000,
-                        debug=False
-                    )
-                    if not_logged_in_check:
-                        print("  [WARN] 刷新后登录状态丢失，继续等待...")
-                        continue
-
-                    # 保存完整状态
-                    await self.save_current_cookies()
-                    return
-
-                await asyncio.sleep(1)
+                if not_logged_in:
+                    remaining_ms = max((deadline - time.time()) * 1000, 1)
+                    try:
+                        await self.page.wait_for_selector(
+                            hit_sel, state="detached", timeout=remaining_ms
+                        )
+                    except Exception:
+                        break  # 等满剩余预算仍未消失 → 登录超时
+
+                print("✓ 检测到登录成功（登录按钮已消失）")
+                self._is_logged_in = True
+
+                # 刷新页面确保状态完整。不等 networkidle（SPA 长连接
+                # 会白等到超时）也不固定 sleep，直接等关键 UI 元素出现
+                await self.page.reload(
+                    wait_until="domcontentloaded", timeout=TIMEOUT["navigation"]
+                )
+                await find_element_fast(
+                    self.page,
+                    SELECTORS_COMPOSED["logged_in_indicator"],
+                    timeout=15000,
+                )
+
+                # 再次确认登录状态
+                not_logged_in_check, _ = await find_element(
+                    self.page,
+                    SELECTORS["not_logged_in_indicator"],
+                    timeout=3000,
+                    debug=False
+                )
+                if not_logged_in_check:
+                    log.warning("  [WARN] 刷新后登录状态丢失，继续等待...")
+                    continue
+
+                # 保存完整状态
+                await self.save_current_cookies()
+                return
 
             raise Exception("登录超时")
         except Exception as e:
@@ -241,29 +298,41 @@ class QwenBrowser:
             raise
 
     async def save_current_cookies(self) -> None:
-        """保存当前状态"""
+        """保存当前状态（内容未变化时跳过写盘，写入走临时文件原子替换）"""
         # 确保目录存在
         STATE_DIR.mkdir(parents=True, exist_ok=True)
 
-        # 获取当前 cookies
-        cookies = await self.context.cookies()
+        # 获取完整的 storage state（cookies 已包含在内，不再双写）
+        state = await self.context.storage_state()
 
-        if DEBUG:
-            print(f"  [DEBUG] 保存 {len(cookies)} 个 cookies:")
+        if log.isEnabledFor(logging.DEBUG):
+            cookies = state.get("cookies", [])
+            log.debug("  [DEBUG] 保存 %d 个 cookies:", len(cookies))
             for c in cookies:
-                print(f"    - {c.get('name')}: {c.get('value')[:20]}... (domain: {c.get('domain')})")
-
-        # 保存完整的 storage state
-        await self.context.storage_state(path=str(STATE_FILE))
+                log.debug("    - %s: %s... (domain: %s)",
+                          c.get("name"), c.get("value")[:20], c.get("domain"))
+
+        serialized = json.dumps(state, ensure_ascii=False, sort_keys=True)
+        h = hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).hexdigest()
+        if h == self._state_hash:
+            log.debug("  [DEBUG] 登录状态未变化，跳过写盘")
+            return
+
+        # 先写临时文件再 rename：中途崩溃不会留下半截状态文件
+        tmp = STATE_FILE.with_suffix(".tmp")
+        tmp.write_text(serialized, encoding="utf-8")
+        os.replace(tmp, STATE_FILE)
+        self._state_hash = h
         print(f"✓ 状态已保存到 {STATE_FILE}")
 
-        # 同时保存 cookies（兼容）
-        save_cookies(cookies, COOKIES_FILE)
-
     async def refresh_page(self) -> None:
-        """刷新页面"""
-        await self.page.reload(timeout=TIMEOUT["navigation"])
-        await asyncio.sleep(1)
+        """刷新页面（等关键 UI 元素出现，而非固定 sleep）"""
+        await self.page.reload(
+            wait_until="domcontentloaded", timeout=TIMEOUT["navigation"]
+        )
+        await find_element_fast(
+            self.page, SELECTORS_COMPOSED["logged_in_indicator"], timeout=10000
+        )
 
     @property
     def is_logged_in(self) -> bool:
@@ -273,6 +342,9 @@ class QwenBrowser:
         """关闭浏览器"""
         if self.browser:
             await self.browser.close()
+        elif self.context:
+            # 持久化模式没有独立的 Browser 对象，关 context 即关浏览器
+            await self.context.close()
         if self.playwright:
             await self.playwright.stop()
         print("✓ 浏览器已关闭")
@@ -1,11 +1,112 @@
 """聊天逻辑模块"""
 import asyncio
 import time
+import weakref
 from pathlib import Path
-from playwright.async_api import Page
-
-from .config import SELECTORS, TIMEOUT, DEBUG
-from .utils import find_element, find_all_elements
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+
+from .config import SELECTORS, SELECTORS_COMPOSED, TIMEOUT, DEBUG
+from .log import log
+from .utils import (
+    find_element,
+    find_element_fast,
+    load_selector_cache,
+    save_selector_cache,
+)
+
+# 页面内响应完成探测器：MutationObserver 每次 DOM 变化重置一个 800ms
+# 去抖定时器；定时器到期时最新回复非空、非发送前旧内容且无生成指示，
+# 即回调 window.__qwen_on_done 推送给 Python。生成期间零 CDP 流量。
+_OBSERVER_JS = """
+(args) => {
+    const [msgSels, stopSels, loadSels, pre] = args;
+    if (window.__qwen_timer) { clearTimeout(window.__qwen_timer); }
+    if (window.__qwen_obs) { try { window.__qwen_obs.disconnect(); } catch (e) {} }
+
+    const latest = () => {
+        for (const s of msgSels) {
+            const ms = document.querySelectorAll(s);
+            if (ms.length) return ms[ms.length - 1].innerText.trim();
+        }
+        return '';
+    };
+    const vis = (el) => {
+        if (!el) return false;
+        const r = el.getBoundingClientRect();
+        const st = getComputedStyle(el);
+        return r.width > 0 && r.height > 0
+            && st.visibility !== 'hidden' && st.display !== 'none';
+    };
+    const generating = () => {
+        for (const s of [...stopSels, ...loadSels]) {
+            try { if (vis(document.querySelector(s))) return true; } catch (e) {}
+        }
+        return false;
+    };
+    const fire = () => {
+        const t = latest();
+        // 还没有新内容或仍在生成：重新武装定时器继续等
+        if (!t || t === pre || generating()) { schedule(); return; }
+        try { window.__qwen_on_done && window.__qwen_on_done(t); } catch (e) {}
+        try { window.__qwen_obs.disconnect(); } catch (e) {}
+    };
+    const schedule = () => {
+        clearTimeout(window.__qwen_timer);
+        window.__qwen_timer = setTimeout(fire, 800);
+    };
+    const obs = new MutationObserver(schedule);
+    obs.observe(document.body,
+                {subtree: true, childList: true, characterData: true});
+    window.__qwen_obs = obs;
+    schedule();
+}
+"""
+
+# 单拍快照：最新回复文本 + 生成中标志一次 evaluate 取回，
+# 代替每拍 _is_generating + _get_latest_response 的多次 CDP 往返
+_SNAPSHOT_JS = """
+(args) => {
+    const [msgSels, stopSels, loadSels] = args;
+    let text = '';
+    for (const s of msgSels) {
+        const ms = document.querySelectorAll(s);
+        if (ms.length) { text = ms[ms.length - 1].innerText.trim(); break; }
+    }
+    const vis = (el) => {
+        if (!el) return false;
+        const r = el.getBoundingClientRect();
+        const st = getComputedStyle(el);
+        return r.width > 0 && r.height > 0
+            && st.visibility !== 'hidden' && st.display !== 'none';
+    };
+    let gen = false;
+    for (const s of [...stopSels, ...loadSels]) {
+        try { if (vis(document.querySelector(s))) { gen = true; break; } } catch (e) {}
+    }
+    return {text, gen};
+}
+"""
+
+# 卸载探测器（超时/异常路径用）
+_OBSERVER_CLEANUP_JS = """
+() => {
+    if (window.__qwen_obs) { try { window.__qwen_obs.disconnect(); } catch (e) {} }
+    if (window.__qwen_timer) { clearTimeout(window.__qwen_timer); }
+}
+"""
+
+# page id → 当前活跃的 QwenChat。expose_function 的回调在 page 生命周期内
+# 只注册一次，经此注册表转发，同一 page 上重建实例后推送仍指向新实例。
+# 弱值引用：实例随管理方释放后条目自动清除，不延长其生命周期。
+_PUSH_TARGETS: "weakref.WeakValueDictionary[int, QwenChat]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _dispatch_push(page_id: int, text: str) -> None:
+    target = _PUSH_TARGETS.get(page_id)
+    if target is not None:
+        target._on_response_done(text)
 
 
 class QwenChat:
@@ -15,28 +116,93 @@ class QwenChat:
         self.page = page
         self._input_selector = None
         self._send_selector = None
+        # 输入框句柄跨消息复用（单页聊天里节点稳定），失效时重新解析
+        self._input_handle = None
+        # 推送通道：页面完成回调 __qwen_on_done → asyncio.Event
+        self._push_ready = False
+        self._done_event = None
+        self._push_text = ""
+
+    def _on_response_done(self, text: str) -> None:
+        """页面侧完成回调（经 _PUSH_TARGETS 注册表转发）"""
+        self._push_text = text or ""
+        if self._done_event is not None:
+            self._done_event.set()
+
+    async def _ensure_push_channel(self) -> None:
+        """注册页面 → Python 的完成推送回调（每个 page 一次）
+
+        expose_function 在一个 page 上只能注册一次，注册的闭包只捕获
+        page id，经模块级注册表转发给当前活跃实例——同一 page 上重建
+        QwenChat 后，把注册表指向新实例即可，推送仍然可达。
+        """
+        pid = id(self.page)
+        _PUSH_TARGETS[pid] = self
+        if self._push_ready:
+            return
+        try:
+            await self.page.expose_function(
+                "__qwen_on_done",
+                lambda text, _pid=pid: _dispatch_push(_pid, text),
+            )
+            self._push_ready = True
+        except Exception as e:
+            # 同名函数已注册（同一 page 上重建 QwenChat）：上面已把
+            # 注册表指向本实例，旧闭包会转发过来，通道照常可用
+            if "already registered" in str(e):
+                self._push_ready = True
+            else:
+                log.debug("  [DEBUG] 推送通道注册失败，退回轮询: %s", e)
 
     async def _ensure_selectors(self) -> None:
-        """确保已找到输入框和发送按钮的选择器"""
+        """确保已找到输入框和发送按钮的选择器
+
+        上次运行命中的选择器缓存在磁盘：冷启动先用 2s 短超时验证缓存项，
+        命中则跳过整段候选扫描；失效（页面改版）退回全量扫描并回写。
+        """
+        cached = load_selector_cache()
+
+        if not self._input_selector:
+            hint = cached.get("input_box")
+            if hint:
+                try:
+                    await self.page.wait_for_selector(hint, timeout=2000)
+                    self._input_selector = hint
+                    log.debug("  [DEBUG] 输入框选择器(缓存): %s", hint)
+                except Exception:
+                    pass
         if not self._input_selector:
             _, self._input_selector = await find_element(
                 self.page,
                 SELECTORS["input_box"],
-                timeout=TIMEOUT["element"]
+                timeout=TIMEOUT["element"],
+                cache_key="input_box",
             )
             if not self._input_selector:
                 raise Exception("找不到输入框，请检查页面是否加载完成或更新选择器配置")
-            print(f"  [DEBUG] 输入框选择器: {self._input_selector}")
+            log.debug("  [DEBUG] 输入框选择器: %s", self._input_selector)
+            save_selector_cache("input_box", self._input_selector)
 
+        if not self._send_selector:
+            hint = cached.get("send_button")
+            if hint:
+                try:
+                    await self.page.wait_for_selector(hint, timeout=2000)
+                    self._send_selector = hint
+                    log.debug("  [DEBUG] 发送按钮选择器(缓存): %s", hint)
+                except Exception:
+                    pass
         if not self._send_selector:
             _, self._send_selector = await find_element(
                 self.page,
                 SELECTORS["send_button"],
-                timeout=TIMEOUT["element"]
+                timeout=TIMEOUT["element"],
+                cache_key="send_button",
             )
             # 发送按钮可能不存在（有些是按回车发送）
             if self._send_selector:
-                print(f"  [DEBUG] 发送按钮选择器: {self._send_selector}")
+                log.debug("  [DEBUG] 发送按钮选择器: %s", self._send_selector)
+                save_selector_cache("send_button", self._send_selector)
 
     async def send_message(self, prompt: str) -> str:
         """发送消息并等待响应"""
@@ -45,24 +211,53 @@ class QwenChat:
 
         print(f"→ 发送消息: {prompt[:50]}{'...' if len(prompt) > 50 else ''}")
 
-        # 输入消息
-        input_box = await self.page.wait_for_selector(
-            self._input_selector,
-            timeout=TIMEOUT["element"]
-        )
+        # 输入消息：优先复用上次的句柄，省一次 wait_for_selector 往返；
+        # 节点被替换/脱离 DOM 时 is_visible 会失败，此时重新解析
+        input_box = self._input_handle
+        if input_box is not None:
+            try:
+                if not await input_box.is_visible():
+                    input_box = None
+            except Exception:
+                input_box = None
+        if input_box is None:
+            input_box = await self.page.wait_for_selector(
+                self._input_selector,
+                timeout=TIMEOUT["element"]
+            )
+            self._input_handle = input_box
 
-        # 清空并输入新内容
+        # 清空并输入新内容：页面内直接设值 + 派发 input 事件，一次 CDP
+        # 往返代替逐字符 type（delay=50 时 400 字的提示词要敲 20 秒）。
+        # evaluate 返回即 DOM 已更新，无需再 sleep 等输入落定
         await input_box.click()
-        # 对于 contenteditable 元素，先选中全部再删除
-        await self.page.keyboard.press("Control+a")
-        await self.page.keyboard.press("Backspace")
-        # 使用 type 而不是 fill，更适合 contenteditable 元素
-        await self.page.keyboard.type(prompt, delay=50)
+        filled = False
+        try:
+            # 设值后回读确认：Slate/ProseMirror 这类框架可能把直接改 DOM
+            # 静默还原，只有回读到的内容和 prompt 一致才算写入成功
+            filled = await self.page.evaluate(
+                """({sel, text}) => {
+                    const el = document.querySelector(sel);
+                    el.focus();
+                    if (el.isContentEditable) { el.innerText = text; }
+                    else { el.value = text; }
+                    el.dispatchEvent(new InputEvent('input', {
+                        bubbles: true, data: text, inputType: 'insertText'
+                    }));
+                    const cur = el.isContentEditable ? el.innerText : el.value;
+                    return cur.trim() === text.trim();
+                }""",
+                {"sel": self._input_selector, "text": prompt},
+            )
+        except Exception:
+            filled = False
+        if not filled:
+            # 兜底：页面框架不认直接设值时退回键盘输入（不加人为延迟）
+            await self.page.keyboard.press("Control+a")
+            await self.page.keyboard.press("Backspace")
+            await self.page.keyboard.type(prompt, delay=0)
 
-        # 短暂等待确保输入完成
-        await asyncio.sleep(0.5)
-        if DEBUG:
-            print(f"  [TIMING] 输入消息: {time.time() - t_start:.1f}s")
+        log.debug("  [TIMING] 输入消息: %.1fs", time.time() - t_start)
 
         # 发送消息 - 优先尝试点击发送按钮
         sent = False
@@ -75,13 +270,14 @@ class QwenChat:
                 if send_btn and await send_btn.is_visible():
                     await send_btn.click()
                     sent = True
-                    print("  [DEBUG] 点击发送按钮")
+                    log.debug("  [DEBUG] 点击发送按钮")
             except Exception as e:
-                print(f"  [DEBUG] 发送按钮点击失败: {e}")
+                log.debug("  [DEBUG] 发送按钮点击失败: %s", e)
 
         # 如果没有发送按钮或点击失败，尝试直接查找并点击页面上可见的发送按钮
         if not sent:
-            # 尝试更多发送按钮选择器
+            # 备选选择器并发探测：全部未命中的代价从 N×1s 降到约 1s，
+            # 第一个可见命中即点击，其余任务取消
             fallback_selectors = [
                 '[class*="sendBtn"]',
                 '[class*="send-btn"]',
@@ -90,65 +286,124 @@ class QwenChat:
                 '[class*="chatInput"] ~ button',
                 '[class*="text-area-slot-container"] button',
             ]
-            for sel in fallback_selectors:
+
+            async def _probe(sel):
+                btn = await self.page.wait_for_selector(sel, timeout=1500)
+                if btn and await btn.is_visible():
+                    return sel, btn
+                raise ValueError(sel)
+
+            tasks = [asyncio.create_task(_probe(s)) for s in fallback_selectors]
+            for fut in asyncio.as_completed(tasks):
                 try:
-                    btn = await self.page.wait_for_selector(sel, timeout=1000)
-                    if btn and await btn.is_visible():
-                        await btn.click()
-                        sent = True
-                        print(f"  [DEBUG] 使用备选按钮发送: {sel}")
-                        break
+                    sel, btn = await fut
+                    await btn.click()
+                    sent = True
+                    log.debug("  [DEBUG] 使用备选按钮发送: %s", sel)
+                    break
                 except Exception:
                     continue
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
 
         # 最后尝试回车发送
         if not sent:
-            print("  [DEBUG] 尝试使用回车发送")
+            log.debug("  [DEBUG] 尝试使用回车发送")
             await self.page.keyboard.press("Enter")
 
         t_sent = time.time()
-        if DEBUG:
-            print(f"  [TIMING] 发送消息: {t_sent - t_start:.1f}s")
+        log.debug("  [TIMING] 发送消息: %.1fs", t_sent - t_start)
 
         # 发送前记录页面已有内容，用于区分新旧响应
         pre_content = await self._get_latest_response()
         if pre_content:
-            print(f"  [DEBUG] 发送前页面已有内容: {pre_content[:80]!r}")
+            log.debug("  [DEBUG] 发送前页面已有内容: %r", pre_content[:80])
 
         print("→ 等待 AI 响应...")
 
         # 等待响应完成（跳过发送前已有的内容）
         response = await self._wait_for_response_complete(pre_content)
-        if DEBUG:
-            print(f"  [TIMING] 等待响应: {time.time() - t_sent:.1f}s")
-            print(f"  [TIMING] send_message 总耗时: {time.time() - t_start:.1f}s")
+        log.debug("  [TIMING] 等待响应: %.1fs", time.time() - t_sent)
+        log.debug("  [TIMING] send_message 总耗时: %.1fs", time.time() - t_start)
 
         return response
 
     async def _wait_for_response_complete(self, pre_content: str = "") -> str:
         """等待响应完成并返回内容
 
-        使用即时 DOM 查询检测生成状态，避免 wait_for_selector 超时带来的延迟。
-        AI 完成后预计 ~0.6 秒内返回（2 次稳定检查 × 0.3 秒间隔）。
+        优先走页面 → Python 推送：安装 MutationObserver 去抖探测器后
+        只 await 一个 asyncio.Event，生成期间零轮询、零 CDP 流量，
+        完成后约一次 800ms 去抖即返回。推送不可用时退回轮询。
 
         Args:
             pre_content: 发送前页面已有的内容，用于跳过旧内容
         """
         t_start = time.time()
+        await self._ensure_push_channel()
+        self._done_event = asyncio.Event()
+        self._push_text = ""
+        if self._push_ready:
+            try:
+                await self.page.evaluate(_OBSERVER_JS, [
+                    SELECTORS["assistant_message"],
+                    SELECTORS["stop_button"],
+                    SELECTORS["loading"],
+                    pre_content,
+                ])
+            except Exception as e:
+                log.debug("  [DEBUG] 探测器安装失败，退回轮询: %s", e)
+            else:
+                try:
+                    await asyncio.wait_for(
+                        self._done_event.wait(),
+                        timeout=TIMEOUT["response_wait"] / 1000,
+                    )
+                    content = (self._push_text or "").strip()
+                    if content:
+                        log.debug("  [TIMING] 响应完成(推送): %.1fs", time.time() - t_start)
+                        print("✓ 响应完成")
+                        return content
+                except asyncio.TimeoutError:
+                    # 超时：返回已到达的部分内容，和轮询路径行为一致
+                    partial = (await self._get_latest_response()).strip()
+                    if partial and partial != pre_content:
+                        log.warning("  [WARN] 响应超时，返回当前内容")
+                        return partial
+                    raise Exception("获取响应超时")
+                finally:
+                    try:
+                        await self.page.evaluate(_OBSERVER_CLEANUP_JS)
+                    except Exception:
+                        pass
+
+        return await self._wait_for_response_polling(pre_content)
+
+    async def _wait_for_response_polling(self, pre_content: str = "") -> str:
+        """轮询版等待响应（推送探测器不可用时的兜底）
+
+        使用即时 DOM 查询检测生成状态，避免 wait_for_selector 超时带来的延迟。
+        AI 完成后预计 ~0.6 秒内返回（2 次稳定检查 × 0.3 秒间隔）。
+        """
+        t_start = time.time()
         t_first_content = None
         last_content = ""
         stable_count = 0
         max_stable = 2  # 内容稳定 0.6 秒即认为完成（每 0.3 秒检查）
         check_interval = 0.3
-        timeout_ms = TIMEOUT["response_wait"]
-        max_checks = int(timeout_ms / (check_interval * 1000))
 
-        for i in range(max_checks):
-            # 检查是否有停止按钮或加载指示器（即时查询，不等待）
-            is_generating = await self._is_generating()
-
-            # 获取最新回复内容
-            current_content = await self._get_latest_response()
+        # 绝对截止时间：按轮数计数会因每轮实际耗时 > 间隔而漂移，
+        # 快照一慢总预算就被悄悄拉长
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + TIMEOUT["response_wait"] / 1000
+        checks = 0
+        while loop.time() < deadline:
+            checks += 1
+            # 生成状态 + 最新内容一次快照取回（单次 CDP 往返，
+            # 代替停止按钮/加载指示器/消息列表的多轮逐个查询）
+            snap = await self._snapshot()
+            is_generating = snap["gen"]
+            current_content = snap["text"]
 
             # 跳过发送前已有的内容（页面残留的旧响应/UI文本）
             if current_content and current_content == pre_content:
@@ -158,15 +413,14 @@ class QwenChat:
             if current_content:
                 if t_first_content is None:
                     t_first_content = time.time()
-                    if DEBUG:
-                        print(f"  [TIMING] 首次检测到新内容: {t_first_content - t_start:.1f}s")
-                    print(f"  [DEBUG] 新内容预览: {current_content[:80]!r}")
+                    log.debug("  [TIMING] 首次检测到新内容: %.1fs", t_first_content - t_start)
+                    log.debug("  [DEBUG] 新内容预览: %r", current_content[:80])
 
                 if current_content == last_content and not is_generating:
                     stable_count += 1
                     if stable_count >= max_stable:
-                        if DEBUG:
-                            print(f"  [TIMING] 内容稳定确认: {time.time() - t_start:.1f}s (检查 {i+1} 轮)")
+                        log.debug("  [TIMING] 内容稳定确认: %.1fs (检查 %d 轮)",
+                                  time.time() - t_start, checks)
                         print("✓ 响应完成")
                         return current_content
                 else:
@@ -177,52 +431,30 @@ class QwenChat:
 
         # 超时但有内容，返回当前内容
         if last_content:
-            print("  [WARN] 响应超时，返回当前内容")
+            log.warning("  [WARN] 响应超时，返回当前内容")
             return last_content
 
         raise Exception("获取响应超时")
 
-    async def _is_generating(self) -> bool:
-        """检查是否正在生成响应
-
-        使用即时 query_selector 代替 wait_for_selector，
-        避免每次调用耗费 ~1 秒的超时等待。
-        """
-        # 检查停止按钮
-        for selector in SELECTORS["stop_button"]:
-            try:
-                el = await self.page.query_selector(selector)
-                if el and await el.is_visible():
-                    return True
-            except Exception:
-                continue
-
-        # 检查加载指示器
-        for selector in SELECTORS["loading"]:
-            try:
-                el = await self.page.query_selector(selector)
-                if el and await el.is_visible():
-                    return True
-            except Exception:
-                continue
-
-        return False
+    async def _snapshot(self) -> dict:
+        """单次往返取回 {text, gen}：最新回复文本 + 是否生成中"""
+        try:
+            return await self.page.evaluate(_SNAPSHOT_JS, [
+                SELECTORS["assistant_message"],
+                SELECTORS["stop_button"],
+                SELECTORS["loading"],
+            ])
+        except Exception:
+            return {"text": "", "gen": False}
 
     async def _get_latest_response(self) -> str:
-        """获取最新的 AI 回复内容"""
-        messages, selector = await find_all_elements(
-            self.page,
-            SELECTORS["assistant_message"]
-        )
+        """获取最新的 AI 回复内容
 
-        if messages:
-            last_message = messages[-1]
-            try:
-                content = await last_message.inner_text()
-                return content.strip()
-            except Exception:
-                return ""
-        return ""
+        单次 evaluate 在页面内取最后一条消息文本，只回传字符串，
+        不枚举全部消息的 ElementHandle。
+        """
+        snap = await self._snapshot()
+        return snap["text"]
 
     async def upload_image(self, image_path: str) -> bool:
         """上传图片
@@ -233,14 +465,39 @@ class QwenChat:
         Returns:
             是否上传成功
         """
-        # 检查文件是否存在
-        if not Path(image_path).exists():
+        # 检查文件是否存在（stat 丢线程池，慢盘/NFS 卡顿不阻塞事件循环）
+        if not await asyncio.to_thread(Path(image_path).exists):
             print(f"  ✗ 图片文件不存在: {image_path}")
             return False
 
         print(f"→ 上传图片: {image_path}")
         t_upload_start = time.time()
 
+        # 快路径：多数网页的上传菜单背后是个常驻的隐藏 <input type=file>，
+        # 直接 set_input_files 就能触发上传，跳过"点附件按钮 → 等菜单 →
+        # 拦 file chooser"的整套交互（两次点击 + 一次对话框往返）
+        try:
+            file_input = await self.page.query_selector('input[type="file"]')
+            if file_input:
+                await file_input.set_input_files(image_path)
+                log.debug("  [DEBUG] 经隐藏 file input 直接上传")
+                print("  → 图片已选择，等待上传...")
+                preview, _ = await find_element(
+                    self.page,
+                    SELECTORS["image_preview"],
+                    timeout=15000,
+                    debug=DEBUG,
+                    cache_key="image_preview",
+                )
+                if preview:
+                    log.debug("  [TIMING] 图片上传: %.1fs", time.time() - t_upload_start)
+                    print("  ✓ 图片上传完成")
+                else:
+                    log.warning("  [WARN] 未检测到图片预览，但继续执行")
+                return True
+        except Exception as e:
+            log.debug("  [DEBUG] 文件输入快路径失败: %s，退回菜单流程", e)
+
         max_retries = 3
         for attempt in range(max_retries):
             try:
@@ -249,7 +506,8 @@ class QwenChat:
                     self.page,
                     SELECTORS["attachment_button"],
                     timeout=5000,
-                    debug=DEBUG and attempt == 0
+                    debug=DEBUG and attempt == 0,
+                    cache_key="attachment_button",
                 )
                 if not attach_btn:
                     print("  ✗ 找不到附件按钮")
@@ -257,8 +515,7 @@ class QwenChat:
 
                 # 点击展开菜单
                 await attach_btn.click()
-                if DEBUG:
-                    print(f"  [DEBUG] 点击附件按钮: {selector}")
+                log.debug("  [DEBUG] 点击附件按钮: %s", selector)
 
                 # 验证下拉菜单是否出现（wait_for_selector 自带等待）
                 menu_item = None
@@ -270,55 +527,60 @@ class QwenChat:
                     pass
 
                 if not menu_item:
-                    if DEBUG:
-                        print(f"  [DEBUG] 下拉菜单未出现 (尝试 {attempt + 1}/{max_retries})")
-                    # 点击空白处关闭可能的弹出状态，然后重试
+                    log.debug("  [DEBUG] 下拉菜单未出现 (尝试 %d/%d)",
+                              attempt + 1, max_retries)
+                    # 点击空白处关闭可能的弹出状态，指数退避后重试
                     try:
                         await self.page.mouse.click(10, 10)
                     except Exception:
                         pass
-                    await asyncio.sleep(0.5)
+                    await asyncio.sleep(min(0.5 * 2 ** attempt, 4))
                     continue
 
                 # 2. 使用 file chooser 拦截文件选择，直接点击已找到的菜单项
                 async with self.page.expect_file_chooser(timeout=10000) as fc_info:
                     await menu_item.click()
-                    if DEBUG:
-                        print("  [DEBUG] 点击上传图片菜单成功")
+                    log.debug("  [DEBUG] 点击上传图片菜单成功")
 
                 # 3. 设置文件
                 file_chooser = await fc_info.value
                 await file_chooser.set_files(image_path)
                 print("  → 图片已选择，等待上传...")
 
-                # 4. 等待图片预览出现（确认上传完成）
+                # 4. 等待图片预览出现（确认上传完成）。重试轮预算压到 8s：
+                # 首轮 15s 没出现的预览，再等也等不来
                 preview, _ = await find_element(
                     self.page,
                     SELECTORS["image_preview"],
-                    timeout=15000,
-                    debug=DEBUG
+                    timeout=15000 if attempt == 0 else 8000,
+                    debug=DEBUG,
+                    cache_key="image_preview",
                 )
                 if preview:
-                    if DEBUG:
-                        print(f"  [TIMING] 图片上传: {time.time() - t_upload_start:.1f}s")
+                    log.debug("  [TIMING] 图片上传: %.1fs", time.time() - t_upload_start)
                     print("  ✓ 图片上传完成")
                     return True
                 else:
-                    print("  [WARN] 未检测到图片预览，但继续执行")
+                    log.warning("  [WARN] 未检测到图片预览，但继续执行")
                     return True
 
-            except Exception as e:
+            except PlaywrightTimeoutError as e:
+                # 只有超时类失败值得重试；指数退避，别用固定 1s 干等
                 if attempt < max_retries - 1:
-                    if DEBUG:
-                        print(f"  [DEBUG] 上传尝试 {attempt + 1} 失败: {e}，重试中...")
+                    log.debug("  [DEBUG] 上传尝试 %d 超时: %s，重试中...",
+                              attempt + 1, e)
                     try:
                         await self.page.mouse.click(10, 10)
                     except Exception:
                         pass
-                    await asyncio.sleep(1)
+                    await asyncio.sleep(min(0.5 * 2 ** attempt, 4))
                 else:
                     print(f"  ✗ 上传图片失败: {e}")
                     return False
+            except Exception as e:
+                # 非超时异常（页面崩溃、文件被拒等）重试也不会变好，直接失败
+                print(f"  ✗ 上传图片失败: {e}")
+                return False
 
         print("  ✗ 上传图片失败：多次重试后仍无法打开上传菜单")
         return False
@@ -335,26 +597,33 @@ class QwenChat:
         """
         t_total = time.time()
 
-        # 上传图片
-        if not await self.upload_image(image_path):
+        # 图片上传和选择器解析互不依赖：并发执行，总耗时 ≈ max(两者)。
+        # 冷启动时选择器全量扫描可达数秒，正好藏进上传的网络等待里
+        upload_task = asyncio.create_task(self.upload_image(image_path))
+        try:
+            await self._ensure_selectors()
+        except Exception:
+            upload_task.cancel()
+            raise
+        if not await upload_task:
             raise Exception("图片上传失败")
 
-        # 短暂等待
-        await asyncio.sleep(0.5)
+        # 上传的预览等待已确认就绪，无需再固定 sleep
 
         # 发送消息
         response = await self.send_message(prompt)
-        if DEBUG:
-            print(f"  [TIMING] send_message_with_image 总耗时: {time.time() - t_total:.1f}s")
+        log.debug("  [TIMING] send_message_with_image 总耗时: %.1fs",
+                  time.time() - t_total)
         return response
 
     async def new_chat(self) -> None:
         """开启新对话（如果页面支持）"""
-        # 重置缓存的选择器（新页面可能需要重新查找）
+        # 重置缓存的选择器和句柄（新页面可能需要重新查找）
         self._input_selector = None
         self._send_selector = None
+        self._input_handle = None
 
-        # 尝试查找新对话按钮
+        # 尝试查找新对话按钮（find_element 在页面内一次竞速全部候选）
         new_chat_selectors = [
             'button[aria-label*="新对话"]',
             'button[aria-label*="新建"]',
@@ -362,16 +631,28 @@ class QwenChat:
             '[class*="newChat"]',
             'a[href="/chat"]',
         ]
-        btn, _ = await find_element(self.page, new_chat_selectors, timeout=3000)
+        # 上次命中的按钮提到最前（磁盘缓存，跨进程复用）
+        cached = load_selector_cache().get("new_chat")
+        if cached in new_chat_selectors and new_chat_selectors[0] != cached:
+            new_chat_selectors = (
+                [cached] + [s for s in new_chat_selectors if s != cached]
+            )
+        btn, hit_sel = await find_element(
+            self.page, new_chat_selectors, timeout=3000, cache_key="new_chat"
+        )
         if btn:
             await btn.click()
+            save_selector_cache("new_chat", hit_sel)
         else:
             # 直接导航到聊天首页，确保获得干净的对话页面
             from .config import QWEN_URL, TIMEOUT
-            print("  [INFO] 未找到新对话按钮，导航到聊天首页...")
+            log.info("  [INFO] 未找到新对话按钮，导航到聊天首页...")
+            # 不等 networkidle（SPA 长连接会白等到超时），下面的输入框
+            # 就绪等待已经覆盖"页面可用"这一条件
             await self.page.goto(QWEN_URL, wait_until="domcontentloaded", timeout=TIMEOUT["navigation"])
-            await self.page.wait_for_load_state("networkidle", timeout=30000)
 
-        # 等待输入框出现，确认页面已就绪（而非固定 sleep）
-        await find_element(self.page, SELECTORS["logged_in_indicator"], timeout=5000)
+        # 等待输入框出现，确认页面已就绪（组选择器一次求值，而非固定 sleep）
+        await find_element_fast(
+            self.page, SELECTORS_COMPOSED["logged_in_indicator"], timeout=5000
+        )
         print("✓ 已开启新对话")
@@ -13,12 +13,30 @@ STATE_FILE = STATE_DIR / "qwen_state.json"
 COOKIES_DIR = ROOT_DIR / "cookies"
 COOKIES_FILE = COOKIES_DIR / "qwen_cookies.json"
 
+# 持久化浏览器 profile 目录（PERSISTENT_PROFILE=1 时使用）
+PROFILE_DIR = STATE_DIR / "profile"
+
+# 上次运行命中的选择器缓存（下次冷启动优先验证，页面改版时自动失效重扫）
+SELECTOR_CACHE_FILE = STATE_DIR / "qwen_selectors.json"
+
+# 守护进程 Unix socket 路径与空闲自动退出时间（秒）
+DAEMON_SOCKET = STATE_DIR / "qwen_daemon.sock"
+DAEMON_IDLE_TIMEOUT = int(os.getenv("DAEMON_IDLE_TIMEOUT", "600"))
+# 守护进程并发会话数：同一浏览器内开 N 个独立 context 并行服务请求
+DAEMON_CONCURRENCY = int(os.getenv("DAEMON_CONCURRENCY", "4"))
+
 # 千问网址
 QWEN_URL = "https://www.qianwen.com/chat"
 
 # 环境变量配置
 DEBUG = os.getenv("DEBUG", "0") == "1"
 SLOW_MO = int(os.getenv("SLOW_MO", "0"))
+# COOKIES_MSGPACK=1: cookies 新写入用 msgpack 二进制编码（需安装 msgpack，
+# 文件带魔数前缀，加载端自动识别，旧 JSON 文件继续可读）
+COOKIES_MSGPACK = os.getenv("COOKIES_MSGPACK", "0") == "1"
+# DEBUG_PRETTY_COOKIES=1: cookies 落盘带缩进（方便人读）；默认紧凑格式，
+# 纯空白字节能占掉文件体积的一大半，生产上没人读它
+DEBUG_PRETTY_COOKIES = os.getenv("DEBUG_PRETTY_COOKIES", "0") == "1"
 
 # 超时配置（毫秒）
 TIMEOUT = {
@@ -117,6 +135,12 @@ SELECTORS = {
     ],
 }
 
+# import 时预拼好的组选择器（k → "sel1, sel2, ..."）：只关心"任一存在"
+# 的调用点用它走一次浏览器原生组求值。注意组选择器不保证候选优先级，
+# 且只能喂给 Playwright 的 wait_for_selector / locator（:has-text 等
+# 伪类 document.querySelector 不认识），需要知道命中哪个的仍用列表。
+SELECTORS_COMPOSED = {k: ", ".join(v) for k, v in SELECTORS.items()}
+
 # 浏览器配置
 BROWSER_CONFIG = {
     "headless": not DEBUG,
@@ -126,16 +150,56 @@ BROWSER_CONFIG = {
         "--disable-infobars",
         "--no-sandbox",
         "--disable-dev-shm-usage",
+        # 冷启动/后台开销类开关：关掉组件更新等后台网络、翻译条 UI、
+        # 前进后退缓存，并禁止后台标签页降频（守护进程场景页面常驻后台）
+        "--disable-background-networking",
+        "--disable-features=TranslateUI,BackForwardCache",
+        "--disable-renderer-backgrounding",
     ],
     "user_agent": (
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
         "AppleWebKit/537.36 (KHTML, like Gecko) "
         "Chrome/120.0.0.0 Safari/537.36"
     ),
+    # PERSISTENT_PROFILE=1: 用 launch_persistent_context 把 JS bundle/
+    # 字体/登录态缓存到磁盘 profile，二次启动页面加载走磁盘缓存。
+    # 注意 profile 目录被浏览器独占锁定，与多浏览器池互斥，
+    # 适合 CLI 单次提问等"频繁冷启动"场景
+    "persistent": os.getenv("PERSISTENT_PROFILE", "0") == "1",
 }
 
 # API 服务配置
 API_CONFIG = {
     "host": os.getenv("API_HOST", "0.0.0.0"),
     "port": int(os.getenv("API_PORT", "8000")),
+    # 浏览器池大小（并发请求数上限 = 池大小）
+    "pool_size": int(os.getenv("POOL_SIZE", "1")),
+    # 单个浏览器处理 N 次请求后整体重建，规避 Playwright 长驻内存增长
+    "pool_recycle_requests": int(os.getenv("POOL_RECYCLE_REQUESTS", "500")),
+    # 单次对话的上游超时（秒），页面卡死时避免无限占用池内浏览器
+    "chat_timeout": float(os.getenv("CHAT_TIMEOUT", "90")),
+    # 每 N 次请求重建一次 BrowserContext（比整浏览器重建轻得多），
+    # 释放 Playwright 在长驻 context 上累积的 Request/Response 对象
+    "context_recycle_requests": int(os.getenv("CONTEXT_RECYCLE_REQUESTS", "200")),
+    # uvicorn worker 数。每个 worker 的 lifespan 各自预热一个浏览器池，
+    # 总 Chromium 进程数 = workers × pool_size，按机器内存酌情取值
+    "workers": int(os.getenv("API_WORKERS", "1")),
+}
+
+# /v1/chat 响应缓存配置
+CACHE_CONFIG = {
+    "enabled": os.getenv("CACHE_ENABLED", "1") == "1",
+    "db_path": str(STATE_DIR / "response_cache.db"),
+    # 语义命中的余弦相似度阈值
+    "threshold": float(os.getenv("CACHE_THRESHOLD", "0.95")),
+    # 缓存有效期（秒），0 表示永不过期
+    "ttl": int(os.getenv("CACHE_TTL", "86400")),
+    # 本地 embedding 模型（依赖 sentence-transformers，未安装则仅精确缓存）
+    "embed_model": os.getenv("CACHE_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+    # int8 量化 ONNX 模型路径（优先于 sentence-transformers，依赖 onnxruntime + tokenizers）
+    "onnx_model": os.getenv("CACHE_ONNX_MODEL", ""),
+    "onnx_tokenizer": os.getenv("CACHE_ONNX_TOKENIZER", ""),
+    # 微批聚合参数：攒批窗口（秒）与单批上限
+    "embed_batch_window": float(os.getenv("CACHE_EMBED_BATCH_WINDOW", "0.005")),
+    "embed_batch_size": int(os.getenv("CACHE_EMBED_BATCH_SIZE", "32")),
 }
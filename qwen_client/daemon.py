@@ -0,0 +1,195 @@
+"""常驻浏览器守护进程
+
+chromium 冷启动动辄数秒，CLI 每次单独提问都要重复付一次启动 + 导航
+的成本。守护进程把浏览器留在后台常驻，前台 CLI 通过 Unix socket 发
+一行 JSON 请求（query / ping / shutdown），首次之后的提问只剩对话
+本身的耗时。空闲超过 DAEMON_IDLE_TIMEOUT 秒自动退出，不长期占内存。
+
+协议：JSON-lines，一行请求一行响应。
+    {"op": "query", "prompt": "...", "image_path": null}
+    → {"ok": true, "response": "..."} 或 {"ok": false, "error": "..."}
+"""
+import asyncio
+import json
+import time
+from typing import Optional
+
+from .browser import QwenBrowser
+from .chat import QwenChat
+from .config import (
+    DAEMON_SOCKET,
+    DAEMON_IDLE_TIMEOUT,
+    DAEMON_CONCURRENCY,
+    QWEN_URL,
+    TIMEOUT,
+    DEBUG,
+)
+
+
+class BrowserDaemon:
+    """常驻浏览器 + Unix socket JSON-lines 服务"""
+
+    def __init__(self, idle_timeout: int = None, concurrency: int = None):
+        self._browser: Optional[QwenBrowser] = None
+        # 空闲会话池：每个会话是独立 context 上的 QwenChat，
+        # 并发请求各借一个并行执行，而不是在单个页面上排队
+        self._sessions: asyncio.Queue = asyncio.Queue()
+        self._concurrency = (
+            concurrency if concurrency is not None else DAEMON_CONCURRENCY
+        )
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._idle_timeout = (
+            idle_timeout if idle_timeout is not None else DAEMON_IDLE_TIMEOUT
+        )
+        self._last_used = time.monotonic()
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        """预热浏览器并开始监听（前台阻塞直到 shutdown/空闲退出）"""
+        print("→ 守护进程启动中...")
+        self._browser = QwenBrowser()
+        await self._browser.launch()
+        logged_in = await self._browser.load_cookies_and_goto()
+        if not logged_in:
+            await self._browser.close()
+            raise RuntimeError("未登录，请先运行: DEBUG=1 python main.py --login")
+
+        # 会话池：首个会话复用 launch 的页面，其余各开独立 context
+        # 共享同一浏览器进程（登录态从当前 context 导出）。
+        # 持久化 profile 模式没有独立 Browser 对象，退化为单会话
+        self._sessions.put_nowait(QwenChat(self._browser.page))
+        if self._concurrency > 1 and self._browser.browser is not None:
+            state = await self._browser.context.storage_state()
+            for _ in range(self._concurrency - 1):
+                try:
+                    ctx = await self._browser._create_context(storage_state=state)
+                    page = await ctx.new_page()
+                    await page.goto(
+                        QWEN_URL, wait_until="domcontentloaded",
+                        timeout=TIMEOUT["navigation"],
+                    )
+                    self._sessions.put_nowait(QwenChat(page))
+                except Exception as e:
+                    print(f"  [WARN] 并发会话预热失败，跳过: {e}")
+        print(f"  并发会话数: {self._sessions.qsize()}")
+
+        DAEMON_SOCKET.parent.mkdir(parents=True, exist_ok=True)
+        if DAEMON_SOCKET.exists():
+            DAEMON_SOCKET.unlink()
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=str(DAEMON_SOCKET)
+        )
+        print(f"✓ 守护进程就绪，监听 {DAEMON_SOCKET}")
+        print(f"  空闲 {self._idle_timeout}s 自动退出")
+
+        watchdog = asyncio.create_task(self._idle_watchdog())
+        try:
+            await self._stopping.wait()
+        finally:
+            watchdog.cancel()
+            self._server.close()
+            await self._server.wait_closed()
+            if DAEMON_SOCKET.exists():
+                DAEMON_SOCKET.unlink()
+            await self._browser.close()
+            print("✓ 守护进程已退出")
+
+    async def _idle_watchdog(self) -> None:
+        """空闲超时自动退出，避免无人用时浏览器长期占内存"""
+        while True:
+            await asyncio.sleep(30)
+            if time.monotonic() - self._last_used > self._idle_timeout:
+                print(f"  [INFO] 空闲超过 {self._idle_timeout}s，自动退出")
+                self._stopping.set()
+                return
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                req = json.loads(line)
+            except json.JSONDecodeError:
+                await self._reply(writer, {"ok": False, "error": "请求不是合法 JSON"})
+                return
+
+            op = req.get("op")
+            if op == "ping":
+                await self._reply(writer, {"ok": True})
+            elif op == "shutdown":
+                await self._reply(writer, {"ok": True})
+                self._stopping.set()
+            elif op == "query":
+                self._last_used = time.monotonic()
+                # 借一个空闲会话；全部占用且 30s 内无人归还则拒绝，
+                # 避免请求在守护进程里无界堆积
+                try:
+                    chat = await asyncio.wait_for(self._sessions.get(), timeout=30)
+                except asyncio.TimeoutError:
+                    await self._reply(writer, {
+                        "ok": False, "error": "并发会话已满，请稍后重试",
+                    })
+                    return
+                try:
+                    prompt = req.get("prompt", "")
+                    image_path = req.get("image_path")
+                    if image_path:
+                        response = await chat.send_message_with_image(
+                            prompt, image_path
+                        )
+                    else:
+                        response = await chat.send_message(prompt)
+                    await self._reply(writer, {"ok": True, "response": response})
+                except Exception as e:
+                    await self._reply(writer, {"ok": False, "error": str(e)})
+                finally:
+                    self._sessions.put_nowait(chat)
+                    self._last_used = time.monotonic()
+            else:
+                await self._reply(writer, {"ok": False, "error": f"未知操作: {op}"})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    @staticmethod
+    async def _reply(writer: asyncio.StreamWriter, payload: dict) -> None:
+        writer.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+
+
+async def ask_daemon(prompt: str, image_path: str = None) -> Optional[str]:
+    """尝试通过守护进程提问；守护进程不在时返回 None（调用方走本地启动）"""
+    if not DAEMON_SOCKET.exists():
+        return None
+    try:
+        reader, writer = await asyncio.open_unix_connection(path=str(DAEMON_SOCKET))
+    except (ConnectionRefusedError, FileNotFoundError, OSError):
+        # socket 残留但进程已死，清掉避免下次再试
+        try:
+            DAEMON_SOCKET.unlink()
+        except OSError:
+            pass
+        return None
+
+    try:
+        req = {"op": "query", "prompt": prompt, "image_path": image_path}
+        writer.write(json.dumps(req, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+        line = await reader.readline()
+        if not line:
+            return None
+        resp = json.loads(line)
+        if resp.get("ok"):
+            return resp.get("response", "")
+        raise Exception(resp.get("error", "守护进程返回错误"))
+    finally:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
@@ -0,0 +1,26 @@
+"""诊断日志
+
+[DEBUG]/[TIMING] 这类诊断输出统一走 logging：热路径上只做一次入队
+（QueueHandler），真正的格式化和终端写出由 QueueListener 的后台线程
+完成，stdout 阻塞不再拖慢被计时的代码段；参数用 % 惰性格式化，
+DEBUG 关闭时连字符串拼接的开销都不付。用户可见的进度提示仍用 print。
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+
+from .config import DEBUG
+
+log = logging.getLogger("qwen")
+
+if not log.handlers:
+    _queue: queue.SimpleQueue = queue.SimpleQueue()
+    _stream = logging.StreamHandler()
+    _stream.setFormatter(logging.Formatter("%(message)s"))
+    _listener = logging.handlers.QueueListener(_queue, _stream)
+    _listener.start()
+    atexit.register(_listener.stop)
+    log.addHandler(logging.handlers.QueueHandler(_queue))
+    log.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+    log.propagate = False
@@ -1,11 +1,12 @@
 """浏览器生命周期管理 + 请求串行化"""
 import asyncio
 import time
+from contextlib import asynccontextmanager
 from typing import Optional
 
 from .browser import QwenBrowser
 from .chat import QwenChat
-from .config import DEBUG
+from .config import API_CONFIG, DEBUG
 
 
 class BrowserManager:
@@ -13,6 +14,7 @@ class BrowserManager:
 
     - asyncio.Lock 串行化请求（一个浏览器同时只处理一个对话）
     - 每 N 次请求做一次 new_chat 清理上下文
+    - 每 M 次请求重建 BrowserContext 规避 Playwright 内存增长
     - 请求前 page.title() 探活，失败则自动重启
     """
 
@@ -23,7 +25,12 @@ class BrowserManager:
         self._chat: Optional[QwenChat] = None
         self._lock = asyncio.Lock()
         self._request_count = 0
+        self._ctx_uses = 0
         self._started = False
+        self._cleanup_task: Optional[asyncio.Task] = None
+        # 上游超时取消 chat 后置位：页面可能仍在生成旧回复，
+        # 归还池前必须清理，否则下个请求会把旧回复当成自己的响应
+        self._tainted = False
 
     @property
     def is_ready(self) -> bool:
@@ -33,6 +40,26 @@ class BrowserManager:
     def request_count(self) -> int:
         return self._request_count
 
+    @property
+    def tainted(self) -> bool:
+        return self._tainted
+
+    def mark_tainted(self) -> None:
+        """标记页面状态可疑（如上游超时把 chat 半路取消）"""
+        self._tainted = True
+
+    async def recover(self) -> None:
+        """污染恢复：先试轻量 new_chat 掐掉在途生成，失败再整浏览器重启"""
+        async with self._lock:
+            self._tainted = False
+            if not self.is_ready:
+                return
+            try:
+                await self._chat.new_chat()
+            except Exception as e:
+                print(f"  [WARN] 超时后 new_chat 失败，重启浏览器: {e}")
+                await self.restart()
+
     async def startup(self) -> None:
         """启动浏览器并加载登录状态"""
         print("→ BrowserManager 启动中...")
@@ -43,12 +70,16 @@ class BrowserManager:
             raise RuntimeError("未登录，请先运行: DEBUG=1 python main.py --login")
         self._chat = QwenChat(self._browser.page)
         self._request_count = 0
+        self._ctx_uses = 0
+        self._tainted = False
         self._started = True
         print("✓ BrowserManager 就绪")
 
     async def shutdown(self) -> None:
         """关闭浏览器"""
         self._started = False
+        if self._cleanup_task and not self._cleanup_task.done():
+            self._cleanup_task.cancel()
         if self._browser:
             await self._browser.close()
             self._browser = None
@@ -62,9 +93,13 @@ class BrowserManager:
         await self.startup()
 
     async def _health_check(self) -> bool:
-        """探活：尝试获取页面 title"""
+        """探活：执行最小 JS 表达式，1s 内没回来视为页面卡死
+
+        比 page.title() 轻（不取页面状态），且 wait_for 兜底保证探活
+        本身不会在 CDP 卡死时无限挂起。
+        """
         try:
-            await self._browser.page.title()
+            await asyncio.wait_for(self._browser.page.evaluate("1"), timeout=1)
             return True
         except Exception:
             return False
@@ -85,10 +120,12 @@ class BrowserManager:
                 print("  [WARN] 页面不可用，自动重启浏览器...")
                 await self.restart()
 
-            # 每 N 次请求清理对话上下文
-            if self._request_count > 0 and self._request_count % self.NEW_CHAT_INTERVAL == 0:
-                print(f"  [INFO] 已处理 {self._request_count} 次请求，清理对话上下文...")
-                await self._chat.new_chat()
+            # 每 M 次请求重建 context，释放长驻 context 累积的对象
+            if self._ctx_uses >= API_CONFIG["context_recycle_requests"]:
+                print(f"  [INFO] context 已处理 {self._ctx_uses} 次请求，重建...")
+                await self._browser.recycle_context()
+                self._chat = QwenChat(self._browser.page)
+                self._ctx_uses = 0
 
             t_start = time.time()
 
@@ -98,8 +135,146 @@ class BrowserManager:
                 response = await self._chat.send_message(prompt)
 
             self._request_count += 1
+            self._ctx_uses += 1
 
             if DEBUG:
                 print(f"  [TIMING] BrowserManager.chat 耗时: {time.time() - t_start:.1f}s")
 
+            # 周期性对话清理挪到后台：触发请求先拿到回复返回，清理任务
+            # 自己抢锁在空闲时执行，第 N 个请求不再扛 reload 的尾延迟
+            if (self._request_count % self.NEW_CHAT_INTERVAL == 0
+                    and (self._cleanup_task is None or self._cleanup_task.done())):
+                self._cleanup_task = asyncio.create_task(self._deferred_new_chat())
+
             return response
+
+    async def _deferred_new_chat(self) -> None:
+        """后台执行的对话上下文清理（抢到锁再做，不打断在途请求）"""
+        async with self._lock:
+            if not self.is_ready:
+                return
+            print(f"  [INFO] 已处理 {self._request_count} 次请求，后台清理对话上下文...")
+            try:
+                await self._chat.new_chat()
+            except Exception as e:
+                print(f"  [WARN] 后台清理对话失败: {e}")
+
+
+class BrowserPool:
+    """预热的 BrowserManager 池
+
+    - 启动时并发预热 N 个浏览器，请求通过 acquire() 借出、用完归还
+    - 并发请求各自拿到独立浏览器并行执行，而不是在单个 page 上排队
+    - 单个浏览器处理请求数超过阈值后归还时重建，规避长驻内存增长
+    """
+
+    def __init__(self, size: int = None, recycle_requests: int = None):
+        self.size = size if size is not None else API_CONFIG["pool_size"]
+        self._recycle_requests = (
+            recycle_requests if recycle_requests is not None
+            else API_CONFIG["pool_recycle_requests"]
+        )
+        self._managers: list = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._started = False
+        # 后台重建任务的强引用（裸 create_task 可能被 gc 掉）
+        self._recycle_tasks: set = set()
+        # /v1/health 直接返回这个快照，状态变化时由池更新，
+        # 探活请求不用每次遍历聚合所有浏览器
+        self.health = {"status": "unavailable", "browser_ready": False,
+                       "request_count": 0}
+
+    @property
+    def is_ready(self) -> bool:
+        return self._started and any(m.is_ready for m in self._managers)
+
+    @property
+    def request_count(self) -> int:
+        return sum(m.request_count for m in self._managers)
+
+    async def startup(self) -> None:
+        """并发预热池内所有浏览器
+
+        N 个浏览器的冷启动各自受限于子进程 + 网络 I/O，gather 并发后
+        总耗时 ≈ max(单个) 而不是 N × 单个。单个浏览器启动失败只从池里
+        剔除该实例，不让整个服务起不来。
+        """
+        print(f"→ BrowserPool 启动中 (size={self.size})...")
+        t_start = time.time()
+        managers = [BrowserManager() for _ in range(self.size)]
+        results = await asyncio.gather(
+            *(m.startup() for m in managers), return_exceptions=True
+        )
+        self._managers = []
+        for m, r in zip(managers, results):
+            if isinstance(r, BaseException):
+                print(f"  [WARN] 浏览器预热失败，剔除该实例: {r}")
+            else:
+                self._managers.append(m)
+        if not self._managers:
+            raise RuntimeError("BrowserPool 启动失败：所有浏览器预热均失败")
+        for m in self._managers:
+            self._queue.put_nowait(m)
+        self._started = True
+        self.health["status"] = "ok"
+        self.health["browser_ready"] = True
+        print(f"✓ BrowserPool 就绪 (size={len(self._managers)}, "
+              f"耗时 {time.time() - t_start:.1f}s)")
+
+    async def shutdown(self) -> None:
+        """关闭池内所有浏览器"""
+        self._started = False
+        self.health["status"] = "unavailable"
+        self.health["browser_ready"] = False
+        for t in self._recycle_tasks:
+            t.cancel()
+        self._recycle_tasks = set()
+        await asyncio.gather(
+            *(m.shutdown() for m in self._managers), return_exceptions=True
+        )
+        self._managers = []
+        self._queue = asyncio.Queue()
+        print("✓ BrowserPool 已关闭")
+
+    async def restart(self) -> None:
+        """重启池内所有浏览器"""
+        await self.shutdown()
+        await self.startup()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """借出一个空闲浏览器，用完自动归还
+
+        Usage:
+            async with pool.acquire() as mgr:
+                await mgr.chat(...)
+        """
+        mgr = await self._queue.get()
+        try:
+            yield mgr
+            self.health["request_count"] += 1
+        finally:
+            # 污染（超时取消后页面可能还在生成旧回复）或达到重建阈值
+            # 时后台处理：manager 先不入池，清理/重建完成后再归还，
+            # 触发请求立即返回，不扛整浏览器冷启动的尾延迟
+            # （与 chunk4-11 把周期性 new_chat 挪后台同理）
+            if mgr.tainted or mgr.request_count >= self._recycle_requests:
+                task = asyncio.create_task(self._recycle_and_requeue(mgr))
+                self._recycle_tasks.add(task)
+                task.add_done_callback(self._recycle_tasks.discard)
+            else:
+                await self._queue.put(mgr)
+
+    async def _recycle_and_requeue(self, mgr) -> None:
+        """后台清理/重建一个 manager，完成后归还池中（失败也归还，靠探活兜底）"""
+        try:
+            if mgr.request_count >= self._recycle_requests:
+                # 整浏览器重建顺带覆盖污染状态，不必先 recover
+                print(f"  [INFO] 浏览器已处理 {mgr.request_count} 次请求，后台重建...")
+                await mgr.restart()
+            elif mgr.tainted:
+                print("  [INFO] 浏览器状态可疑（上游超时），归还前清理...")
+                await mgr.recover()
+        except Exception as e:
+            print(f"  [WARN] 浏览器后台清理/重建失败: {e}")
+        await self._queue.put(mgr)
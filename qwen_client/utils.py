@@ -1,83 +1,381 @@
 """工具函数"""
+import asyncio
+import hashlib
 import json
+import mmap
+import os
+import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from playwright.async_api import Page
 
+# orjson（SIMD 加速）可选：未安装时退回标准库 json
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
 
-async def find_element(page: Page, selectors: list[str], timeout: int = 5000, debug: bool = False):
+# msgpack（二进制编码）可选：COOKIES_MSGPACK=1 且已安装时用于新写入
+try:
+    import msgpack as _msgpack
+except ImportError:
+    _msgpack = None
+
+from .config import COOKIES_MSGPACK, DEBUG_PRETTY_COOKIES, SELECTOR_CACHE_FILE
+from .log import log
+
+
+def load_selector_cache() -> dict:
+    """读取上次运行命中的选择器缓存（kind → 选择器字符串）
+
+    文件不存在或损坏时返回空 dict，调用方按原始候选列表扫描。
+    """
+    try:
+        with open(SELECTOR_CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_selector_cache(kind: str, selector: str) -> None:
+    """记录某类元素命中的选择器，下次冷启动直接验证（失败静默）"""
+    try:
+        cache = load_selector_cache()
+        if cache.get(kind) == selector:
+            return
+        cache[kind] = selector
+        SELECTOR_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(SELECTOR_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+    except Exception:
+        pass
+
+# 在浏览器内竞速全部 CSS 候选：先同步查一遍，未命中则挂一个
+# MutationObserver，DOM 一变就重查，命中当帧 resolve（推送而非轮询，
+# 等待期间零 CDP 流量）；超时 resolve null 交还 Python 侧决定重试
+_RACE_JS = """
+([sels, timeoutMs]) => new Promise((resolve) => {
+    const check = () => {
+        for (const s of sels) {
+            try {
+                const e = document.querySelector(s);
+                if (e && e.offsetParent !== null) return s;
+            } catch (err) {}
+        }
+        return null;
+    };
+    const first = check();
+    if (first) return resolve(first);
+    let timer = null;
+    const mo = new MutationObserver(() => {
+        const hit = check();
+        if (hit) { mo.disconnect(); clearTimeout(timer); resolve(hit); }
+    });
+    mo.observe(document.documentElement,
+               {subtree: true, childList: true, attributes: true});
+    timer = setTimeout(() => { mo.disconnect(); resolve(null); }, timeoutMs);
+})
+"""
+
+# Playwright 专有语法，document.querySelector 不认识，只能走 wait_for_selector
+_SPECIAL_TOKENS = (":has-text(", "text=", ">>")
+
+# 进程内"上次命中"记忆（cache_key → 选择器）：同一角色的元素在页面
+# 改版前总是同一个选择器命中，稳态下直接短超时验证它，跳过整轮候选扫描
+_WORKING: dict[str, str] = {}
+
+# find_element 两轮扫描之间的退避间隔（毫秒）：页面确实没就绪时
+# 重查间隔逐步拉大，不在 CDP 通道上空转
+_BACKOFF_MS = (50, 100, 200, 400, 800, 1500, 3000)
+
+
+def _is_css_safe(selector: str) -> bool:
+    return not any(tok in selector for tok in _SPECIAL_TOKENS)
+
+
+@lru_cache(maxsize=64)
+def _split_css_special(selectors: tuple) -> tuple:
+    """把候选列表拆成 (标准 CSS, Playwright 专有语法) 两组
+
+    同一候选列表在热路径上反复传入，拆分结果按元组键缓存，
+    import 后每个列表只拆一次。
+    """
+    # 返回 list：css 会原样作为 arg 传给 wait_for_function 序列化
+    css = [s for s in selectors if _is_css_safe(s)]
+    special = [s for s in selectors if not _is_css_safe(s)]
+    return css, special
+
+
+async def find_element(page: Page, selectors: list[str], timeout: int = 5000,
+                       debug: bool = False, *, cache_key: str = None):
     """尝试多个选择器，返回第一个找到的元素
 
-    对于长超时场景，会循环快速尝试所有选择器，而不是每个选择器等待全部超时时间
+    标准 CSS 选择器融合成一次 evaluate 在浏览器内观察者竞速
+    （每轮 1 次往返）；Playwright 专有语法（:has-text 等）退回
+    并发短超时探测。所有选择器共享 timeout 总预算。
+
+    传 cache_key 时优先用上次命中的选择器做一次 ≤500ms 的快速验证，
+    命中即返回；失效（页面改版）自动退回全量扫描并更新记忆。
     """
-    import time
-    start_time = time.time()
-    per_selector_timeout = min(2000, timeout)  # 每个选择器最多等 2 秒
+    hint = _WORKING.get(cache_key) if cache_key else None
+    if hint:
+        try:
+            element = await page.wait_for_selector(
+                hint, timeout=min(500, timeout)
+            )
+            if element:
+                return element, hint
+        except Exception:
+            pass
+
+    # 单调时钟 + 绝对截止时间：每轮只读一次 loop.time()（C 级、单调），
+    # 不再每次比较都做 time.time() 系统调用加乘法换算
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout / 1000
+    css, special = _split_css_special(tuple(selectors))
 
     attempt = 0
-    while (time.time() - start_time) * 1000 < timeout:
+    while True:
+        remaining = (deadline - loop.time()) * 1000
+        if remaining <= 0:
+            break
         attempt += 1
         if debug and attempt == 1:
-            print(f"  尝试选择器列表: {selectors}")
+            log.debug("  尝试选择器列表: %s", selectors)
 
-        for selector in selectors:
+        # 1. CSS 选择器：一次 evaluate 在页面内观察者竞速所有候选
+        if css:
             try:
-                element = await page.wait_for_selector(selector, timeout=per_selector_timeout)
-                if element:
-                    if debug:
-                        print(f"  ✓ 匹配成功: {selector}")
-                    return element, selector
+                hit = await page.evaluate(
+                    _RACE_JS, [css, min(2000, remaining)]
+                )
+                if hit:
+                    element = await page.query_selector(hit)
+                    if element:
+                        if debug:
+                            log.debug("  ✓ 匹配成功: %s", hit)
+                        if cache_key:
+                            _WORKING[cache_key] = hit
+                        return element, hit
             except Exception:
-                continue
+                pass
+
+        # 2. 专有语法选择器：并发探测 + FIRST_COMPLETED 竞速——首个命中
+        # 立即返回（延迟 ≈ min(tᵢ)），不等慢的/注定超时的探测跑完；
+        # 同批完成多个命中时按候选顺序取优先级最高的
+        if special:
+            remaining = (deadline - loop.time()) * 1000
+            if remaining <= 0:
+                break
+            budget = min(500, remaining)
+            tasks = {
+                asyncio.create_task(page.wait_for_selector(s, timeout=budget)): s
+                for s in special
+            }
+            pending = set(tasks)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    hits = [t for t in done
+                            if not t.cancelled() and t.exception() is None
+                            and t.result()]
+                    if hits:
+                        winner = min(
+                            hits, key=lambda t: special.index(tasks[t])
+                        )
+                        selector = tasks[winner]
+                        if debug:
+                            log.debug("  ✓ 匹配成功: %s", selector)
+                        if cache_key:
+                            _WORKING[cache_key] = selector
+                        return winner.result(), selector
+            finally:
+                for t in pending:
+                    t.cancel()
 
         if debug and attempt == 1:
-            print(f"  ✗ 第一轮所有选择器均未匹配，继续轮询...")
+            log.debug("  ✗ 第一轮所有选择器均未匹配，继续轮询...")
+
+        # 指数退避后再开下一轮（观察者/探测本身已覆盖轮内的等待）
+        remaining = (deadline - loop.time()) * 1000
+        if remaining <= 0:
+            break
+        delay = _BACKOFF_MS[min(attempt - 1, len(_BACKOFF_MS) - 1)]
+        await asyncio.sleep(min(delay, remaining) / 1000)
 
     if debug:
-        print(f"  ✗ 超时，共尝试 {attempt} 轮")
+        log.debug("  ✗ 超时，共尝试 %d 轮", attempt)
     return None, None
 
 
-async def find_all_elements(page: Page, selectors: list[str]):
-    """尝试多个选择器，返回第一个有结果的元素列表"""
+async def find_element_fast(page: Page, composed: str, timeout: int = 5000):
+    """等待合并组选择器中任一候选出现（不关心具体命中哪个）
+
+    一次 wait_for_selector 让浏览器原生求值整组候选，代替逐个探测；
+    composed 取自 config.SELECTORS_COMPOSED。需要命中信息的调用方
+    仍用 find_element。
+    """
+    try:
+        return await page.wait_for_selector(
+            composed, timeout=timeout, state="attached"
+        )
+    except Exception:
+        return None
+
+
+async def find_all_elements(page: Page, selectors: list[str], *,
+                            cache_key: str = None):
+    """尝试多个选择器，返回第一个有结果的元素列表
+
+    同样支持 cache_key：上次命中的选择器提到最前先查。
+    """
+    hint = _WORKING.get(cache_key) if cache_key else None
+    if hint and hint in selectors:
+        selectors = [hint] + [s for s in selectors if s != hint]
     for selector in selectors:
         try:
             elements = await page.query_selector_all(selector)
             if elements:
+                if cache_key:
+                    _WORKING[cache_key] = selector
                 return elements, selector
         except Exception:
             continue
     return [], None
 
 
+# (路径 → (mtime_ns, 解析结果))：同一文件反复加载（如 BrowserManager
+# 重启）时跳过重复的磁盘读 + JSON 解析；文件改写后 mtime 变化自动失效
+_COOKIES_MEMO: dict = {}
+
+
+def _cookies_sidecar(filepath: Path) -> Path:
+    """cookies 文件对应的 sha256 校验旁路文件路径"""
+    return filepath.with_suffix(filepath.suffix + ".sha256")
+
+
+# msgpack 格式文件的魔数前缀：加载端据此识别格式，旧 JSON 文件无缝兼容
+_MSGPACK_MAGIC = b"MP1\x00"
+
+
+def _warn_on_sidecar_mismatch(filepath: Path, buf) -> None:
+    """旁路指纹比对，不匹配只告警不否决
+
+    旁路在数据文件 os.replace 之后才写入，两步之间崩溃（或绕过
+    save_cookies 的写入方）会留下过期旁路——此时数据文件完全有效，
+    据此丢登录态反而是完整性校验帮了倒忙。交给解析器做最终裁决。
+    """
+    sidecar = _cookies_sidecar(filepath)
+    try:
+        if sidecar.exists() and \
+                hashlib.sha256(buf).hexdigest() != sidecar.read_text().strip():
+            log.warning("✗ Cookies 旁路校验不匹配，尝试直接解析: %s", filepath)
+    except OSError:
+        pass
+
+
+def _decode_cookie_bytes(buf) -> list:
+    """按魔数识别 cookies 内容格式（msgpack / JSON）并解析"""
+    if _msgpack is not None and len(buf) >= 4 and bytes(buf[:4]) == _MSGPACK_MAGIC:
+        return _msgpack.unpackb(buf[4:], raw=False)
+    if _orjson is not None:
+        return _orjson.loads(buf)
+    return json.loads(bytes(buf))
+
+
 def save_cookies(cookies: list[dict], filepath: Path) -> None:
-    """保存 cookies 到文件"""
+    """保存 cookies 到文件（优先 orjson 二进制直写，附带 sha256 校验）
+
+    先写临时文件、fsync 后 os.replace 原子替换：进程中途崩溃不会
+    留下半截 JSON 让下次加载白付一轮解析失败。
+    """
     filepath.parent.mkdir(parents=True, exist_ok=True)
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(cookies, f, ensure_ascii=False, indent=2)
-    print(f"✓ Cookies 已保存到 {filepath}")
+    if COOKIES_MSGPACK and _msgpack is not None:
+        # 二进制编码：体积更小、解码无 UTF-8 状态机；带魔数供加载端识别
+        data = _MSGPACK_MAGIC + _msgpack.packb(cookies, use_bin_type=True)
+    elif _orjson is not None:
+        # 默认紧凑输出；DEBUG_PRETTY_COOKIES=1 才带缩进方便人工检查
+        opt = _orjson.OPT_INDENT_2 if DEBUG_PRETTY_COOKIES else 0
+        data = _orjson.dumps(cookies, option=opt)
+    elif DEBUG_PRETTY_COOKIES:
+        data = json.dumps(cookies, ensure_ascii=False, indent=2).encode("utf-8")
+    else:
+        data = json.dumps(
+            cookies, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+    tmp = filepath.with_suffix(filepath.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filepath)
+    # 旁路同样走临时文件 + 原子替换，缩小与数据文件不一致的窗口；
+    # 两步之间崩溃留下的旧旁路由加载端降级处理（见 load_cookies）
+    sidecar = _cookies_sidecar(filepath)
+    sidecar_tmp = sidecar.with_suffix(sidecar.suffix + ".tmp")
+    sidecar_tmp.write_text(hashlib.sha256(data).hexdigest())
+    os.replace(sidecar_tmp, sidecar)
+    _COOKIES_MEMO.pop(filepath, None)
+    log.info("✓ Cookies 已保存到 %s", filepath)
 
 
 def load_cookies(filepath: Path) -> Optional[list[dict]]:
-    """从文件加载 cookies"""
+    """从文件加载 cookies（按 mtime 记忆解析结果）
+
+    存在 .sha256 旁路文件时先校验内容指纹：损坏的文件在几微秒的哈希
+    比对就能发现，不用等 JSON 解析到一半才报错。旁路缺失（旧文件）或
+    不匹配（写入旁路前崩溃、第三方写入等）都只降级为直接解析并告警——
+    数据文件本身完好时绝不能因旁路过期丢掉登录态，解析失败才是最终裁决。
+    """
     if not filepath.exists():
         return None
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            cookies = json.load(f)
-        print(f"✓ 已加载 Cookies: {filepath}")
+        mtime = filepath.stat().st_mtime_ns
+        cached = _COOKIES_MEMO.get(filepath)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        # orjson 接受 buffer 协议对象：mmap 后直接交给解析器，
+        # 省掉 read() 的整份字节拷贝（空文件 mmap 会抛错，走 except 兜底）
+        if _orjson is not None:
+            with open(filepath, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                _warn_on_sidecar_mismatch(filepath, mm)
+                cookies = _decode_cookie_bytes(mm)
+        else:
+            raw = filepath.read_bytes()
+            _warn_on_sidecar_mismatch(filepath, raw)
+            cookies = _decode_cookie_bytes(raw)
+        _COOKIES_MEMO[filepath] = (mtime, cookies)
+        log.info("✓ 已加载 Cookies: %s", filepath)
         return cookies
     except Exception as e:
-        print(f"✗ 加载 Cookies 失败: {e}")
+        log.warning("✗ 加载 Cookies 失败: %s", e)
         return None
 
 
-def print_banner():
-    """打印启动横幅"""
-    banner = """
+async def asave_cookies(cookies: list[dict], filepath: Path) -> None:
+    """save_cookies 的异步版：写盘丢线程池，不阻塞事件循环"""
+    await asyncio.to_thread(save_cookies, cookies, filepath)
+
+
+async def aload_cookies(filepath: Path) -> Optional[list[dict]]:
+    """load_cookies 的异步版（mtime 记忆命中时几乎无磁盘开销）"""
+    return await asyncio.to_thread(load_cookies, filepath)
+
+
+# 启动横幅常量化：每次调用不再重建字符串，直接一次 write 输出
+_BANNER = """
 ╔═══════════════════════════════════════╗
 ║         Qwen Web Client               ║
 ║   通义千问网页版自动化工具            ║
 ╚═══════════════════════════════════════╝
-    """
-    print(banner)
+    \n"""
+
+
+def print_banner():
+    """打印启动横幅"""
+    sys.stdout.write(_BANNER)
@@ -4,16 +4,47 @@
 Usage:
     python server.py
     API_PORT=9000 python server.py
+    API_WORKERS=2 python server.py
     DEBUG=1 python server.py
 """
 import uvicorn
 
 from qwen_client.config import API_CONFIG
 
+
+def _loop_impl() -> str:
+    """uvloop 可用时用它（异步调度 C 实现），否则退回默认 asyncio"""
+    try:
+        import uvloop  # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+def _http_impl() -> str:
+    """httptools 可用时用 C 实现的 HTTP 解析器"""
+    try:
+        import httptools  # noqa: F401
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+
 if __name__ == "__main__":
+    workers = API_CONFIG["workers"]
+    # 单 worker 时直接 import app 对象：应用在 uvicorn 起循环前就加载完，
+    # lifespan 预热（浏览器池）先于 accept，首批并发请求不会撞上惰性
+    # import。多 worker 必须保留字符串目标，子进程各自 import
+    if workers == 1:
+        from api.app import app as target
+    else:
+        target = "api.app:app"
     uvicorn.run(
-        "api.app:app",
+        target,
         host=API_CONFIG["host"],
         port=API_CONFIG["port"],
+        workers=workers,
+        loop=_loop_impl(),
+        http=_http_impl(),
         log_level="info",
     )